@@ -1,23 +1,77 @@
+import heapq
+import time
 from collections import namedtuple
 from sortedcontainers import SortedListWithKey
 
 
 class Trie:
-    def __init__(self):
+    def __init__(self, top_k=None):
+        """
+        :param top_k: keep the top_k most frequent completions in every node, they are updated on add
+        """
         self.children = {}
+        self.top_k = top_k
 
     def add(self, word, score):
         curr = self.children
+        path = [curr]
         for letter in word:
             if letter not in curr:
                 curr[letter] = {}
             curr = curr[letter]
+            path.append(curr)
         curr['score'] = score
 
+        if self.top_k:
+            for depth, node in enumerate(path):
+                self.__update_top(node, word[:depth], word, score)
+
+    def __update_top(self, node, prefix, word, score):
+        top = node.setdefault('top', [])
+        old = [i for i, (completion, _) in enumerate(top) if completion == word]
+        if old and score < top[old[0]][1] and len(top) == self.top_k:
+            # the word went down in the ranking, a word missing from the list may take its place
+            node['top'] = self.__collect_top(node, prefix, self.top_k)
+            return
+
+        if old:
+            del top[old[0]]
+        top.append((word, score))
+        top.sort(key=lambda x: (-x[1], x[0]))
+        del top[self.top_k:]
+
+    def __collect_top(self, node, prefix, k):
+        stack, completions = [(node, prefix)], []
+        while stack:
+            node, prefix = stack.pop()
+            if 'score' in node:
+                completions.append((prefix, node['score']))
+            for ch in node:
+                if ch not in ('score', 'top'):
+                    stack.append((node[ch], prefix + ch))
+        return heapq.nsmallest(k, completions, key=lambda x: (-x[1], x[0]))
+
+    def completions(self, node, prefix, k):
+        """
+        Returns k most frequent words under the node, from the precomputed list when it is long enough
+        """
+        if self.top_k and k <= self.top_k and 'top' in node:
+            return node['top'][:k]
+        return self.__collect_top(node, prefix, k)
+
     def find_most_freq(self, prefix):
         curr = self.find(prefix)
+        if curr and 'top' in curr:
+            return curr['top'][0]
         return self.__preorder_for_most_freq(curr, prefix) if curr else None
 
+    def find_top(self, prefix, k):
+        """
+        Returns up to k precomputed completions of the prefix, k must not exceed top_k
+        """
+        curr = self.find(prefix)
+        return curr['top'][:k] if curr else []
+
     def find(self, prefix):
         curr = self.children
         for letter in prefix:
@@ -37,48 +91,147 @@ class Trie:
                 max_count = node['score']
                 max_key = prefix
             for ch in node:
-                if ch != 'score':
+                if ch not in ('score', 'top'):
                     stack.append((node[ch], prefix + ch))
         return max_key, max_count
 
 
 class AutoComplete:
-    def __init__(self, vocab=None):
+    def __init__(self, vocab=None, top_k=None):
+        """
+        :param vocab: dictionary word -> score
+        :param top_k: precompute top_k completions in every trie node,
+        then queries with k <= top_k don't traverse the subtree of the prefix
+        """
         self.node = namedtuple('Node', 'word count')
-        self.heap = SortedListWithKey(key=lambda x: -x.count)
-        self.dictionary = Trie()
+        self.dictionary = Trie(top_k)
         if vocab:
             assert type(vocab) == dict
             for word, score in vocab.items():
                 self.dictionary.add(word, score)
 
-    def __preorder(self, node, prefix):
+    def __preorder(self, node, prefix, heap):
         stack = [(node, prefix)]
         while stack:
             node, prefix = stack.pop()
             if 'score' in node:
-                self.heap.add(self.node(prefix, node['score']))
+                heap.add(self.node(prefix, node['score']))
             for ch in node:
-                if ch != 'score':
+                if ch not in ('score', 'top'):
                     stack.append((node[ch], prefix + ch))
 
     def get_k_auto_completes(self, prefix, k=1):
         if k == 1:
             return self.dictionary.find_most_freq(prefix)
+        elif self.dictionary.top_k and k <= self.dictionary.top_k:
+            return self.dictionary.find_top(prefix, k)
         else:
             node = self.dictionary.find(prefix)
             if not node:
                 return []
 
-            self.__preorder(node, prefix)
+            heap = SortedListWithKey(key=lambda x: -x.count)
+            self.__preorder(node, prefix, heap)
             answer = []
 
-            while k > 0:
-                node = self.heap.pop(0)
+            while k > 0 and heap:
+                node = heap.pop(0)
                 answer.append((node.word, node.count))
                 k -= 1
             return answer
 
+    def get_k_fuzzy_completes(self, prefix, k=1, max_edits=1, time_budget=None):
+        """
+            Completions of a prefix with typos: the trie is walked with Levenstein rows of the prefix,
+            a word gets the least distance between the prefix and its beginnings, the words are ranked
+            by the number of edits and then by score.
+            With precomputed top_k >= k every node within max_edits from the prefix gives its cached k best words.
+            Otherwise a node keeps the least distance of its path so far, and a branch where the prefix
+            can't be matched any more gives the k best words of its subtree with this distance,
+            so every subtree is walked only once
+        :param prefix: typed prefix
+        :param k: number of completions
+        :param max_edits: maximum Levenstein distance between the prefix and the beginning of a word
+        :param time_budget: time limit in seconds, when it is over the best completions found so far are returned
+        :return: list of (word, score)
+        """
+        deadline = time.perf_counter() + time_budget if time_budget is not None else None
+        use_top = self.dictionary.top_k and k <= self.dictionary.top_k
+        best = {}
+
+        def merge(completes, edits):
+            for word, score in completes:
+                if word not in best or edits < best[word][0]:
+                    best[word] = (edits, score)
+
+        stack = [(self.dictionary.children, '', list(range(len(prefix) + 1)), max_edits + 1)]
+        while stack:
+            if deadline is not None and time.perf_counter() > deadline:
+                break
+
+            node, path, row, edits = stack.pop()
+            edits = min(edits, row[-1])
+            if use_top and row[-1] <= max_edits:
+                merge(self.dictionary.completions(node, path, k), row[-1])
+            elif not use_top and edits <= max_edits and 'score' in node:
+                merge([(path, node['score'])], edits)
+
+            for ch in node:
+                if ch in ('score', 'top'):
+                    continue
+                next_row = [row[0] + 1]
+                for i in range(1, len(row)):
+                    next_row.append(min(next_row[i - 1] + 1, row[i] + 1, row[i - 1] + (prefix[i - 1] != ch)))
+                if min(next_row) <= max_edits:
+                    stack.append((node[ch], path + ch, next_row, edits))
+                elif not use_top and edits <= max_edits:
+                    # the prefix can't match better below, every word of the subtree gets the current number of edits
+                    merge(self.dictionary.completions(node[ch], path + ch, k), edits)
+
+        ranked = sorted(best.items(), key=lambda x: (x[1][0], -x[1][1], x[0]))
+        return [(word, score) for word, (_, score) in ranked[:k]]
+
+    def start_session(self, k=1):
+        return AutoCompleteSession(self.dictionary, k)
+
+
+class AutoCompleteSession:
+    """
+        Completions for a prefix typed letter by letter: the session keeps the stack of trie nodes
+        of the prefix and the completions of every level, so typing a letter is one step down the trie
+        and deleting a letter is a pop. The dictionary must not change during the session
+    """
+
+    def __init__(self, dictionary, k=1):
+        """
+        :param dictionary: Trie of completions, preferably with top_k >= k
+        :param k: number of completions
+        """
+        self.dictionary = dictionary
+        self.k = k
+        self.prefix = ''
+        self.nodes = [dictionary.children]
+        self.completes = [dictionary.completions(dictionary.children, '', k)]
+
+    def push(self, ch):
+        node = self.nodes[-1]
+        node = node.get(ch) if node is not None else None
+
+        self.prefix += ch
+        self.nodes.append(node)
+        self.completes.append(self.dictionary.completions(node, self.prefix, self.k) if node is not None else [])
+        return self.completes[-1]
+
+    def pop(self):
+        if self.prefix:
+            self.prefix = self.prefix[:-1]
+            self.nodes.pop()
+            self.completes.pop()
+        return self.completes[-1]
+
+    def get_completes(self):
+        return self.completes[-1]
+
 
 if __name__ == '__main__':
     trie = Trie()
@@ -98,3 +251,45 @@ if __name__ == '__main__':
     }
     complete = AutoComplete(vocab=vocabulary)
     print(complete.get_k_auto_completes('hacker', k=3))
+    assert complete.get_k_auto_completes('hacker', k=3) == complete.get_k_auto_completes('hacker', k=3)
+    assert len(complete.get_k_auto_completes('hacker', k=10)) == 4
+
+    # Test precomputed top-k completions
+    complete = AutoComplete(vocab=vocabulary, top_k=3)
+    assert complete.get_k_auto_completes('hacker', k=3) == [('hackerrating', 11), ('hackerearth', 10),
+                                                            ('hackerrank', 9)]
+    assert complete.get_k_auto_completes('hackerr', k=2) == [('hackerrating', 11), ('hackerrank', 9)]
+    assert complete.get_k_auto_completes('hacker', k=1) == ('hackerrating', 11)
+    assert complete.get_k_auto_completes('hacke', k=10) == [('hackerrating', 11), ('hackerearth', 10),
+                                                            ('hackerrank', 9), ('hacker', 6)]
+    assert not complete.get_k_auto_completes('hacks', k=2)
+
+    complete.dictionary.add('hackerrank', 12)
+    assert complete.get_k_auto_completes('hacker', k=2) == [('hackerrank', 12), ('hackerrating', 11)]
+    complete.dictionary.add('hackerrank', 1)
+    assert complete.get_k_auto_completes('hacker', k=3) == [('hackerrating', 11), ('hackerearth', 10),
+                                                            ('hacker', 6)]
+
+    # Test completions of prefixes with typos
+    complete = AutoComplete(vocab=vocabulary, top_k=3)
+    assert complete.get_k_fuzzy_completes('hackre', k=2) == [('hackerrating', 11), ('hackerearth', 10)]
+    assert not complete.get_k_fuzzy_completes('hakcer', k=2)
+    assert complete.get_k_fuzzy_completes('hakcer', k=3, max_edits=2) == [('hackerrating', 11),
+                                                                          ('hackerearth', 10),
+                                                                          ('hackerrank', 9)]
+    assert complete.get_k_fuzzy_completes('hacker', k=2, max_edits=0) == [('hackerrating', 11),
+                                                                          ('hackerearth', 10)]
+    assert not complete.get_k_fuzzy_completes('xyzw', k=2)
+    assert AutoComplete(vocab=vocabulary).get_k_fuzzy_completes('hakcer', k=4, max_edits=2) == \
+        complete.get_k_fuzzy_completes('hakcer', k=4, max_edits=2)
+
+    # Test keystroke session
+    session = complete.start_session(k=2)
+    for ch in 'hacke':
+        session.push(ch)
+    assert session.get_completes() == [('hackerrating', 11), ('hackerearth', 10)]
+    assert session.push('r') == [('hackerrating', 11), ('hackerearth', 10)]
+    assert session.push('r') == [('hackerrating', 11), ('hackerrank', 9)]
+    assert session.push('x') == [] and session.push('y') == []
+    assert session.pop() == [] and session.pop() == [('hackerrating', 11), ('hackerrank', 9)]
+    assert session.pop() == complete.get_k_auto_completes('hacker', k=2)
@@ -0,0 +1,155 @@
+"""
+    Frozen table of bigram counts used by spell-checkers for context scoring
+"""
+import os
+
+import numpy as np
+
+from StringPool import StringPool
+
+
+class BigramContextTable:
+    """
+        Counts of (left token, right token) bigrams from a corpus of correct texts.
+        Every bigram is packed into an int64 key `left_id * n_tokens + right_id`,
+        keys are sorted, so a lookup is a binary search without any vectorizer call
+    """
+    BEGIN, END = '^', '$'
+
+    def __init__(self, tokens=None, keys=None, counts=None):
+        """
+        :param tokens: mapping token -> token id
+        :param keys: sorted int64 array of bigram keys
+        :param counts: counts aligned with keys
+        """
+        self.tokens = tokens if tokens is not None else {}
+        self.keys = keys if keys is not None else np.empty(0, dtype=np.int64)
+        self.counts = counts if counts is not None else np.empty(0, dtype=np.int64)
+
+    @classmethod
+    def from_vectorizer(cls, vectorizer, encoded_texts):
+        """
+        Build a table from a fitted bigram CountVectorizer
+        :param vectorizer: CountVectorizer with ngram_range=(2, 2)
+        :param encoded_texts: document-term matrix returned by vectorizer.fit_transform
+        :return: BigramContextTable
+        """
+        totals = np.asarray(encoded_texts.sum(axis=0)).ravel()
+        bigrams = [(bigram.split(' '), col) for bigram, col in vectorizer.vocabulary_.items()]
+
+        # токены нумеруются в алфавитном порядке, чтобы после загрузки искать их бинарным поиском
+        tokens = {token: token_id for token_id, token in enumerate(sorted({t for pair, _ in bigrams for t in pair}))}
+
+        pairs, pair_counts = [], []
+        for (left, right), col in bigrams:
+            pairs.append((tokens[left], tokens[right]))
+            pair_counts.append(totals[col])
+
+        pairs = np.array(pairs, dtype=np.int64).reshape(-1, 2)
+        keys = pairs[:, 0] * len(tokens) + pairs[:, 1]
+        order = np.argsort(keys)
+
+        return cls(tokens, keys[order], np.array(pair_counts, dtype=np.int64)[order])
+
+    def __len__(self):
+        return len(self.keys)
+
+    def save(self, path, name='context'):
+        StringPool.from_strings(sorted(self.tokens, key=self.tokens.get)).save(path, f'{name}_tokens')
+        np.save(os.path.join(path, f'{name}_keys.npy'), self.keys)
+        np.save(os.path.join(path, f'{name}_counts.npy'), self.counts)
+
+    @classmethod
+    def load(cls, path, name='context', mmap=True):
+        """
+        Loads a saved table, the bigram arrays are memory-mapped and the token -> id dict
+        is built once per process, so a lookup doesn't binary search over decoded strings
+        """
+        mmap_mode = 'r' if mmap else None
+        tokens = {token: token_id for token_id, token in enumerate(StringPool.load(path, f'{name}_tokens', mmap))}
+        return cls(tokens,
+                   np.load(os.path.join(path, f'{name}_keys.npy'), mmap_mode=mmap_mode),
+                   np.load(os.path.join(path, f'{name}_counts.npy'), mmap_mode=mmap_mode))
+
+    def count(self, left, right):
+        """
+        Returns the corpus count of bigram (left, right), 0 for unknown ones
+        """
+        count = self.__lookup(left, right)
+        return count if count is not None else 0
+
+    def context_counts(self, prev_word, word):
+        """
+        Counts of the known bigrams of the phrase `^ prev_word word $`,
+        the same bigrams the vectorizer extracts from f"{prev_word} {word}"
+        :return: list of counts, one per distinct bigram found in the table
+        """
+        phrase = [self.BEGIN] + f"{prev_word} {word}".lower().split() + [self.END]
+
+        counts = []
+        for left, right in dict.fromkeys(zip(phrase, phrase[1:])):
+            count = self.__lookup(left, right)
+            if count is not None:
+                counts.append(count)
+        return counts
+
+    def __lookup(self, left, right):
+        left_id, right_id = self.tokens.get(left), self.tokens.get(right)
+        if left_id is None or right_id is None:
+            return None
+
+        key = left_id * len(self.tokens) + right_id
+        pos = int(np.searchsorted(self.keys, key))
+        return int(self.counts[pos]) if pos < len(self.keys) and self.keys[pos] == key else None
+
+
+if __name__ == '__main__':
+    import tempfile
+    from sklearn.feature_extraction.text import CountVectorizer
+
+    def tokenize(text):
+        return ['^'] + text.split() + ['$']
+
+    texts = ['я читал книгу', 'я читал газету', 'Мы читали книгу']
+    voc_vectorizer = CountVectorizer(tokenizer=tokenize, token_pattern=None, ngram_range=(2, 2))
+    table = BigramContextTable.from_vectorizer(voc_vectorizer, voc_vectorizer.fit_transform(texts))
+
+    assert table.count('я', 'читал') == 2
+    assert table.count('читал', 'книгу') == 1
+    assert table.count('книгу', 'я') == 0
+    assert table.count('нет', 'такого') == 0
+    assert sorted(table.context_counts('я', 'читал')) == [2, 2]
+    assert sorted(table.context_counts('^', 'мы')) == [1]
+    assert not table.context_counts('газету', 'я')
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        table.save(tmp_dir)
+        loaded = BigramContextTable.load(tmp_dir)
+        assert loaded.count('я', 'читал') == 2
+        assert sorted(loaded.context_counts('я', 'читал')) == [2, 2]
+        assert not loaded.context_counts('газету', 'я')
+
+    # Test that a loaded table answers as fast as a fitted one on a non-trivial vocabulary
+    import random
+    import time
+
+    rng = random.Random(0)
+    vocabulary = [''.join(rng.choice('абвгдеёжзиклмнопрстуфхцчшщыэюя') for _ in range(rng.randint(3, 10)))
+                  for _ in range(50000)]
+    texts = [' '.join(rng.choice(vocabulary) for _ in range(10)) for _ in range(20000)]
+    table = BigramContextTable.from_vectorizer(voc_vectorizer, voc_vectorizer.fit_transform(texts))
+    queries = [(rng.choice(vocabulary), rng.choice(vocabulary)) for _ in range(20000)]
+
+    def lookup_seconds(context):
+        start = time.perf_counter()
+        for prev_word, word in queries:
+            context.context_counts(prev_word, word)
+        return time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        table.save(tmp_dir)
+        loaded = BigramContextTable.load(tmp_dir)
+        assert all(loaded.context_counts(*query) == table.context_counts(*query) for query in queries[:1000])
+
+        fitted_seconds, loaded_seconds = lookup_seconds(table), lookup_seconds(loaded)
+        assert loaded_seconds < 2 * fitted_seconds, (fitted_seconds, loaded_seconds)
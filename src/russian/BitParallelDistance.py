@@ -0,0 +1,116 @@
+"""
+    Bit-parallel bounded edit distances (Myers 1999, Hyyrö 2003)
+    Python integers serve as bit-vectors of any length, so words of any size are supported
+"""
+from typing import Dict, Iterable, List, Optional
+
+
+def _pattern_masks(pattern: str) -> Dict[str, int]:
+    """
+    For every letter of the pattern returns a bit-vector of its positions
+    """
+    masks = {}
+    for i, letter in enumerate(pattern):
+        masks[letter] = masks.get(letter, 0) | (1 << i)
+    return masks
+
+
+def _bounded_distance(masks: Dict[str, int], pattern_len: int, text: str,
+                      max_dist: Optional[int], transpositions: bool) -> int:
+    """
+    Computes the last row of the DP matrix column by column.
+    After the j-th column the final distance can't be less than `dist - (len(text) - j)`,
+    so the computation stops as soon as this bound exceeds `max_dist`
+    :return: the distance or max_dist + 1 if it is greater than max_dist
+    """
+    text_len = len(text)
+    cutoff = max_dist if max_dist is not None else pattern_len + text_len
+
+    if abs(pattern_len - text_len) > cutoff:
+        return cutoff + 1
+    if not pattern_len:
+        return text_len
+
+    full = (1 << pattern_len) - 1
+    last = 1 << (pattern_len - 1)
+    vp, vn, d0, prev_pm = full, 0, 0, 0
+    dist = pattern_len
+
+    for j, letter in enumerate(text, 1):
+        pm = masks.get(letter, 0)
+        tr = ((~d0 & pm) << 1) & prev_pm if transpositions else 0
+        d0 = ((((pm & vp) + vp) ^ vp) | pm | vn | tr) & full
+        prev_pm = pm
+
+        hp = (vn | ~(d0 | vp)) & full
+        hn = d0 & vp
+        if hp & last:
+            dist += 1
+        elif hn & last:
+            dist -= 1
+
+        if dist - (text_len - j) > cutoff:
+            return cutoff + 1
+
+        hp = ((hp << 1) | 1) & full
+        hn = (hn << 1) & full
+        vp = (hn | ~(d0 | hp)) & full
+        vn = hp & d0
+
+    return dist
+
+
+def levenshtein_distance(first: str, second: str, max_dist: Optional[int] = None) -> int:
+    """
+    Levenshtein distance, returns max_dist + 1 for the pairs which are farther than max_dist
+    """
+    return _bounded_distance(_pattern_masks(first), len(first), second, max_dist, False)
+
+
+def damerau_levenshtein_distance(first: str, second: str, max_dist: Optional[int] = None) -> int:
+    """
+    Damerau-Levenshtein distance with adjacent transpositions (optimal string alignment),
+    returns max_dist + 1 for the pairs which are farther than max_dist
+    """
+    return _bounded_distance(_pattern_masks(first), len(first), second, max_dist, True)
+
+
+def levenshtein_distance_many(query: str, candidates: Iterable[str], max_dist: Optional[int] = None) -> List[int]:
+    """
+    Levenshtein distances from one query to many candidates, the query bit-vectors are built once
+    """
+    masks, query_len = _pattern_masks(query), len(query)
+    return [_bounded_distance(masks, query_len, candidate, max_dist, False) for candidate in candidates]
+
+
+def damerau_levenshtein_distance_many(query: str, candidates: Iterable[str],
+                                      max_dist: Optional[int] = None) -> List[int]:
+    """
+    Damerau-Levenshtein distances from one query to many candidates, the query bit-vectors are built once
+    """
+    masks, query_len = _pattern_masks(query), len(query)
+    return [_bounded_distance(masks, query_len, candidate, max_dist, True) for candidate in candidates]
+
+
+if __name__ == '__main__':
+
+    # Test standard Levenstein distance
+    assert levenshtein_distance('', '') == 0
+    assert levenshtein_distance('', 'abc') == 3
+    assert levenshtein_distance('abc', '') == 3
+    assert levenshtein_distance('kitten', 'sitting') == 3
+    assert levenshtein_distance('ehllo', 'hello') == 2
+    assert levenshtein_distance('kitten', 'sitting', max_dist=2) == 3
+    assert levenshtein_distance('a', 'abcdefgh', max_dist=3) == 4
+
+    # Test Damerau-Levenstein distance
+    assert damerau_levenshtein_distance('ehllo', 'hello') == 1
+    assert damerau_levenshtein_distance('leetcdoe', 'leetcode') == 1
+    assert damerau_levenshtein_distance('ca', 'abc') == 3
+    assert damerau_levenshtein_distance('малако', 'молоко') == 2
+    assert damerau_levenshtein_distance('малако', 'молоко', max_dist=1) == 2
+
+    # Test one query vs many candidates
+    assert levenshtein_distance_many('hhllo', ['hello', 'hallo', 'leetcode', 'hell'], max_dist=2) == [1, 1, 3, 2]
+    assert damerau_levenshtein_distance_many('ehllo', ['hello', 'hallo', 'bell', 'leetcode']) == [1, 2, 3, 6]
+    assert damerau_levenshtein_distance_many('ehllo', ['hello', 'hallo', 'bell', 'leetcode'], 2) == [1, 2, 3, 3]
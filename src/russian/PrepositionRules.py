@@ -0,0 +1,281 @@
+"""
+    Табличные правила для исправления битых предлогов и частиц.
+    Правила - обычные данные (списки и словари), поэтому наборы правил можно поставлять в JSON
+"""
+import codecs
+import json
+import re
+import string
+from typing import Callable, Dict, FrozenSet, List
+
+from SpellerCache import LRUCache
+
+# вместо исправления вернуть токен задом наперёд
+REVERSED = '<reversed>'
+
+PRONOUNS = ['то', 'та', 'те', 'так', 'это', 'эта', 'эти',
+            'той', 'тем', 'там', 'том', 'тех',
+            'этих', 'этой', 'этом', 'согласно']
+
+# Группа правил срабатывает для битых токенов из `tokens` либо для токенов, в которых находится `pattern`.
+# Правила группы проверяются по порядку: первое, у которого выполнены все условия `all`
+# и хотя бы одно из условий `any`, даёт исправление `fix`; если не сработало ни одно, токен не меняется.
+# Условие - [имя предиката, аргумент], префикс `not_` отрицает предикат
+PREP_RULES = [
+    {'tokens': ['е'], 'rules': [
+        {'any': [['tag', 'VERB'], ['word_in', ['только', 'более', 'менее', 'больше', 'меньше']]], 'fix': 'не'}]},
+    {'tokens': ['аа'], 'rules': [{'fix': 'а'}]},
+    {'tokens': ['даа', 'дда'], 'rules': [{'fix': 'да'}]},
+    {'tokens': ['ии'], 'rules': [{'fix': 'и'}]},
+    {'tokens': ['илли', 'иили'], 'rules': [{'fix': 'или'}]},
+    {'tokens': ['отт'], 'rules': [{'fix': 'от'}]},
+    {'tokens': ['ри'], 'rules': [{'fix': 'при'}]},
+    {'tokens': ['ыб', 'бл'], 'rules': [{'fix': 'был'}]},
+    {'tokens': ['ым', 'ыт', 'ыв'], 'rules': [{'fix': REVERSED}]},
+    {'tokens': ['зи', 'ов', 'од', 'ан', 'оп', 'ми', 'хи', 'ен'], 'rules': [
+        {'all': [['not_tag', 'PREP']], 'fix': REVERSED}]},
+    {'tokens': ['аз'], 'rules': [
+        {'all': [['tag', 'accs']], 'fix': REVERSED},
+        {'all': [['first_tag', 'VERB']], 'fix': 'раз'}]},
+    {'tokens': ['в'], 'rules': [
+        {'all': [['word_in', ['время']]], 'fix': 'во'}]},
+    {'tokens': ['д'], 'rules': [
+        {'all': [['not_punct'], ['not_word_in', ['..', '...', ',,']]], 'fix': 'до'}]},
+    {'tokens': ['з'], 'rules': [
+        {'all': [['min_len', 2], ['tag', 'gent']], 'fix': 'из'},
+        {'all': [['min_len', 2]], 'any': [['tag', 'accs'], ['tag', 'ablt']], 'fix': 'за'}]},
+    {'tokens': ['н'], 'rules': [
+        {'all': [['min_len', 2]], 'any': [['tag', 'accs'], ['tag', 'loct'], ['tag', 'loc2']], 'fix': 'на'},
+        {'all': [['min_len', 2], ['first_tag', 'VERB']], 'fix': 'он'}]},
+    {'tokens': ['п'], 'rules': [
+        {'any': [['tag', 'datv'], ['tag', 'loct'], ['tag', 'loc2'], ['digit']], 'fix': 'по'}]},
+    {'tokens': ['т'], 'rules': [
+        {'all': [['min_len', 2], ['tag', 'gent']], 'fix': 'от'},
+        {'all': [['min_len', 2]], 'any': [['tag', 'ablt'], ['word_in', ['же', 'есть']]], 'fix': 'то'},
+        {'all': [['min_len', 2], ['tag', 'femn']], 'fix': 'та'}]},
+    {'tokens': ['х'], 'rules': [
+        {'all': [['not_punct'], ['not_digit']], 'fix': 'их'}]},
+    {'tokens': ['чо'], 'rules': [{'fix': 'что'}]},
+    {'tokens': ['о'], 'rules': [
+        {'all': [['word_in', ['время']]], 'fix': 'во'}]},
+    {'tokens': ['ноо'], 'rules': [
+        {'all': [['not_alpha']], 'fix': 'но'}]},
+    {'tokens': ['кк'], 'rules': [
+        {'all': [['first_tag', 'datv']], 'fix': 'к'},
+        {'all': [['not_punct']], 'fix': 'как'}]},
+    {'tokens': ['оо'], 'rules': [
+        {'all': [['tag', 'loct']], 'fix': 'о'}]},
+    {'tokens': ['сс'], 'rules': [
+        {'any': [['tag', 'gent'], ['tag', 'ablt'], ['word_match', r'^[12]\d{3}']], 'fix': 'с'}]},
+    {'pattern': r'\b(н{2,}а|на{2,})\b', 'rules': [
+        {'any': [['tag', 'accs'], ['tag', 'loct'], ['tag', 'loc2'], ['digit']], 'fix': 'на'}]},
+    {'tokens': ['пр'], 'rules': [
+        {'all': [['tag', 'loct']], 'fix': 'при'},
+        {'all': [['tag', 'accs']], 'fix': 'про'}]},
+    {'tokens': ['эо'], 'rules': [{'fix': 'это'}]},
+    {'tokens': ['эт'], 'rules': [
+        {'all': [['tag', 'femn'], ['tag', 'accs']], 'fix': 'эту'},
+        {'all': [['tag', 'femn']], 'any': [['tag', 'gent'], ['tag', 'datv']], 'fix': 'этой'},
+        {'all': [['tag', 'femn']], 'fix': 'эта'},
+        {'all': [['tag', 'masc'], ['not_tag', 'ablt']], 'fix': 'этот'},
+        {'fix': 'это'}]},
+]
+
+# правила для токена, стоящего после слова `word` и перед словом `next_word` на позиции `ind`
+PREP_AFTER_WORDS_RULES = [
+    {'tokens': ['вв'], 'rules': [
+        {'all': [['index', 0]], 'fix': 'в'},
+        {'all': [['min_index', 1], ['not_contains', 'ivx']], 'fix': 'в'},
+        {'all': [['next_in', ['время']]], 'fix': 'во'}]},
+    {'tokens': ['тс'], 'rules': [
+        {'all': [['min_index', 1], ['digit']], 'fix': 'тыс'}]},
+    {'tokens': ['мк'], 'rules': [
+        {'all': [['digit']], 'fix': REVERSED}]},
+    {'tokens': ['е'], 'rules': [
+        {'all': [['word_in', PRONOUNS]], 'fix': 'же'},
+        {'all': [['tag', 'Name']], 'fix': 'де'},
+        {'all': [['not_next_in', ['']], ['not_next_punct']], 'fix': 'ее'}]},
+    {'tokens': ['ж'], 'rules': [
+        {'all': [['word_in', PRONOUNS]], 'fix': 'же'}]},
+    {'tokens': ['ил'], 'rules': [
+        {'all': [['tag', 'VERB']], 'fix': 'ли'},
+        {'fix': 'или'}]},
+]
+
+
+class PrepositionRules:
+    """
+        Правила, скомпилированные в словарь по битому токену: для токена проверяются только его правила.
+        Группы с регулярными выражениями проверяются, только если токена нет в словаре
+    """
+
+    def __init__(self, rules: List[Dict], tags: Callable[[str], FrozenSet[str]],
+                 first_tags: Callable[[str], FrozenSet[str]]):
+        """
+        :param rules: группы правил, см. PREP_RULES
+        :param tags: функция слово -> граммемы по всем разборам
+        :param first_tags: функция слово -> граммемы первого разбора
+        """
+        self.__tags = tags
+        self.__first_tags = first_tags
+        self.predicates = {
+            'tag': lambda arg, word, next_word, ind: arg in self.__tags(word),
+            'first_tag': lambda arg, word, next_word, ind: arg in self.__first_tags(word),
+            'word_in': lambda arg, word, next_word, ind: word in arg,
+            'word_match': lambda arg, word, next_word, ind: arg.search(word) is not None,
+            'contains': lambda arg, word, next_word, ind: arg in word,
+            'min_len': lambda arg, word, next_word, ind: len(word) >= arg,
+            'digit': lambda arg, word, next_word, ind: word.isdigit(),
+            'alpha': lambda arg, word, next_word, ind: word.isalpha(),
+            'punct': lambda arg, word, next_word, ind: word in string.punctuation,
+            'next_in': lambda arg, word, next_word, ind: next_word in arg,
+            'next_punct': lambda arg, word, next_word, ind: next_word in string.punctuation,
+            'index': lambda arg, word, next_word, ind: ind == arg,
+            'min_index': lambda arg, word, next_word, ind: ind >= arg,
+        }
+
+        self.dispatch = {}
+        self.patterns = []
+        for group in rules:
+            clauses = [self.__compile_clause(rule) for rule in group['rules']]
+            for token in group.get('tokens', []):
+                self.dispatch[token] = clauses
+            if 'pattern' in group:
+                self.patterns.append((re.compile(group['pattern']), clauses))
+
+    @classmethod
+    def from_json(cls, path: str, tags: Callable[[str], FrozenSet[str]],
+                  first_tags: Callable[[str], FrozenSet[str]]) -> 'PrepositionRules':
+        with codecs.open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f), tags, first_tags)
+
+    def __compile_condition(self, condition):
+        name, arg = condition[0], condition[1] if len(condition) > 1 else None
+        negate = name.startswith('not_')
+        if negate:
+            name = name[len('not_'):]
+
+        if name not in self.predicates:
+            raise ValueError(f'Unknown predicate: {condition[0]}')
+        if name == 'word_match':
+            arg = re.compile(arg)
+        elif name in ('word_in', 'next_in'):
+            arg = frozenset(arg)
+
+        predicate = self.predicates[name]
+        if negate:
+            return lambda word, next_word, ind: not predicate(arg, word, next_word, ind)
+        return lambda word, next_word, ind: predicate(arg, word, next_word, ind)
+
+    def __compile_clause(self, rule):
+        conditions = [self.__compile_condition(condition) for condition in rule.get('all', [])]
+
+        alternatives = [self.__compile_condition(condition) for condition in rule.get('any', [])]
+        if alternatives:
+            conditions.append(lambda word, next_word, ind: any(alt(word, next_word, ind) for alt in alternatives))
+
+        return conditions, rule['fix']
+
+    def fix(self, prep: str, word: str, next_word='', ind=0) -> str:
+        """
+        Исправление токена или сам токен, если ни одно правило не сработало
+        :param prep: битый токен
+        :param word: слово, которое проверяют правила
+        :param next_word: слово после токена
+        :param ind: позиция токена в предложении
+        """
+        clauses = self.dispatch.get(prep)
+        if clauses is None:
+            clauses = next((clauses for pattern, clauses in self.patterns if pattern.search(prep)), [])
+
+        for conditions, fix in clauses:
+            if all(condition(word, next_word, ind) for condition in conditions):
+                return prep[::-1] if fix == REVERSED else fix
+        return prep
+
+
+class PrepositionFixer(object):
+    """
+        Исправление битых предлогов, общее для спеллеров: граммемы слов берутся из морфологического
+        анализатора и запоминаются в кэше, по ним проверяются правила перед словом и после слова
+    """
+
+    def __init__(self, morph, prep_rules=PREP_RULES, prep_after_words_rules=PREP_AFTER_WORDS_RULES,
+                 tags_cache_size=100000):
+        """
+        :param morph: морфологический анализатор с методом parse (pymorphy2.MorphAnalyzer)
+        :param prep_rules: правила для битых предлогов перед словом
+        :param prep_after_words_rules: правила для битых предлогов после слова
+        :param tags_cache_size: число слов в кэше морфологических тегов
+        """
+        self.morph = morph
+
+        # кэш граммем слова, чтобы эвристики для предлогов не разбирали одно слово по несколько раз
+        self.tags_cache = LRUCache(maxsize=tags_cache_size)
+
+        # скомпилированные правила для битых предлогов
+        self.prep_rules = PrepositionRules(prep_rules, self.all_parses_tags, self.first_parse_tags)
+        self.prep_after_words_rules = PrepositionRules(prep_after_words_rules,
+                                                       self.all_parses_tags, self.first_parse_tags)
+
+    def __parse_tags(self, word):
+        """
+            Граммемы слова: объединение по всем разборам и граммемы первого разбора
+        """
+        tags = self.tags_cache.get(word)
+        if tags is None:
+            parses = self.morph.parse(word)
+            tags = (frozenset().union(*(parse.tag.grammemes for parse in parses)), parses[0].tag.grammemes)
+            self.tags_cache.put(word, tags)
+        return tags
+
+    # граммемы по всем разборам слова
+    def all_parses_tags(self, word):
+        return self.__parse_tags(word)[0]
+
+    # граммемы наиболее вероятного разбора слова
+    def first_parse_tags(self, word):
+        return self.__parse_tags(word)[1]
+
+    # строим эвристики для битых предлогов
+    def need_fix_prep(self, word, prep):
+        return self.prep_rules.fix(prep, word)
+
+    def need_fix_prep_after_words(self, word, prep, next_word, ind):
+        return self.prep_after_words_rules.fix(prep, word, next_word, ind)
+
+
+if __name__ == '__main__':
+    tags_dict = {
+        'читал': frozenset({'VERB'}),
+        'времени': frozenset({'NOUN', 'gent', 'neut'}),
+        'книгу': frozenset({'NOUN', 'accs', 'femn'}),
+        'столом': frozenset({'NOUN', 'ablt', 'masc'}),
+        'маша': frozenset({'NOUN', 'Name', 'femn'}),
+    }
+    rules = PrepositionRules(PREP_RULES, lambda w: tags_dict.get(w, frozenset()),
+                             lambda w: tags_dict.get(w, frozenset()))
+
+    assert rules.fix('е', 'читал') == 'не'
+    assert rules.fix('е', 'только') == 'не'
+    assert rules.fix('е', 'книгу') == 'е'
+    assert rules.fix('дда', 'книгу') == 'да'
+    assert rules.fix('ов', 'книгу') == 'во'
+    assert rules.fix('з', 'времени') == 'из'
+    assert rules.fix('з', 'столом') == 'за'
+    assert rules.fix('нна', 'книгу') == 'на'
+    assert rules.fix('нааа', '2015') == 'на'
+    assert rules.fix('сс', '2015') == 'с'
+    assert rules.fix('д', '...') == 'д'
+    assert rules.fix('эт', 'книгу') == 'эту'
+    assert rules.fix('эт', 'столом') == 'это'
+    assert rules.fix('xyz', 'книгу') == 'xyz'
+
+    after_rules = PrepositionRules(PREP_AFTER_WORDS_RULES, lambda w: tags_dict.get(w, frozenset()),
+                                   lambda w: tags_dict.get(w, frozenset()))
+    assert after_rules.fix('вв', 'xivx', 'время', 0) == 'в'
+    assert after_rules.fix('вв', 'xivx', 'время', 2) == 'во'
+    assert after_rules.fix('е', 'это', 'дом', 3) == 'же'
+    assert after_rules.fix('е', 'маша', 'дом', 3) == 'де'
+    assert after_rules.fix('е', 'книгу', '.', 3) == 'е'
+    assert after_rules.fix('ил', 'книгу', '', 3) == 'или'
@@ -4,19 +4,24 @@
 """
 import codecs
 import csv
+import json
+import os
 import time
 from collections import Counter, defaultdict
-from pyxdameraulevenshtein import damerau_levenshtein_distance
-from functools import lru_cache
 
 import nltk
 from nltk.corpus import stopwords
 import numpy as np
 import pandas as pd
 import pymorphy2
-import re
 from sklearn.feature_extraction.text import CountVectorizer
-import string
+
+from BigramContextTable import BigramContextTable
+from BitParallelDistance import damerau_levenshtein_distance_many
+from PrepositionRules import PREP_AFTER_WORDS_RULES, PREP_RULES, PrepositionFixer
+from SpellerCache import LRUCache
+from StringPool import StringPool
+from WordDawg import WordDawg
 
 nltk.download('stopwords')
 all_stopwords = stopwords.words('russian') + stopwords.words('english')
@@ -52,53 +57,71 @@ class WordDict:
         return self
 
 
-class StatisticalSpeller(object):
+class StatisticalSpeller(PrepositionFixer):
     """
         Поиск слов, наиболее близких по числу общих n-грамм и
         последующее ранжирование по эвристике-близости
     """
 
-    __pron_set = ['то', 'та', 'те', 'так', 'это', 'эта', 'эти',
-                  'той', 'тем', 'там', 'том', 'тех',
-                  'этих', 'этой', 'этом', 'согласно']
+    __punct_fixes = {',,': ',', '..': '...'}
 
     @staticmethod
     def tokenize(text):
         return ['^'] + [t for t in text.split()] + ['$']
 
-    def __init__(self, n_candidates_search=150):
+    def __init__(self, n_candidates_search=150, index_mode='dict', cache=None, tags_cache_size=100000,
+                 prep_rules=PREP_RULES, prep_after_words_rules=PREP_AFTER_WORDS_RULES):
         """
         :param n_candidates_search: число кандидатов-строк при поиске
+        :param index_mode: 'dict' - словарь списков термов,
+                           'csr' - постинги в непрерывных массивах NumPy (indptr/indices)
+        :param cache: кэш исправлений (LRUCache, TinyLFUCache), по умолчанию LRU на миллион пар слов
+        :param tags_cache_size: число слов в кэше морфологических тегов
+        :param prep_rules: правила для битых предлогов перед словом (см. PrepositionRules)
+        :param prep_after_words_rules: правила для битых предлогов после слова
         """
+        super().__init__(pymorphy2.MorphAnalyzer(), prep_rules, prep_after_words_rules, tags_cache_size)
+
+        assert index_mode in ('dict', 'csr')
         self.n_candidates = n_candidates_search
-        self.morph = pymorphy2.MorphAnalyzer()
+        self.index_mode = index_mode
+        self.cache = cache if cache is not None else LRUCache(maxsize=1000000)
 
         # векторайзеры для нграмного индекса и частотного словаря
         self.vectorizer = CountVectorizer(analyzer="char_wb", ngram_range=(2, 3), binary=True)
         self.voc_vectorizer = CountVectorizer(tokenizer=self.tokenize, ngram_range=(2, 2))
 
-        # нграмный индекс + частотный словарь биграм по корпусу текстов
-        self.index = defaultdict(set)
-        self.voc = defaultdict(int)
+        # нграмный индекс + частотная таблица биграм контекста по корпусу текстов
+        self.index = defaultdict(list)
+        self.index_indptr = None
+        self.index_indices = None
+        self.context = BigramContextTable()
         self.words_list = None
 
-        # регэкспы для битых предлогов
-        self.on_prep = re.compile(r'\b(н{2,}а|на{2,})\b')
-        self.year = re.compile(r'^[12]\d{3}')
-
     def fit(self, words_list):
         """
             Подгонка спеллера
         """
 
         checkpoint = time.time()
+        self.cache.invalidate()
         self.words_list = words_list
 
-        encoded_words = self.vectorizer.fit_transform(words_list).tocoo()
+        encoded_words = self.vectorizer.fit_transform(words_list)
 
-        # строим словарь, отображающий идентификатор нграммы в множество термов
-        for ind in zip(encoded_words.row, encoded_words.col):
-            self.index[ind[1]].add(ind[0])
+        if self.index_mode == 'csr':
+            # транспонируем матрицу: постинги нграммы t лежат в indices[indptr[t]:indptr[t + 1]]
+            postings = encoded_words.tocsc()
+            postings.sort_indices()
+            self.index_indptr = postings.indptr.astype(np.int64)
+            self.index_indices = postings.indices.astype(np.int32)
+        else:
+            encoded_words = encoded_words.tocoo()
+
+            # строим словарь, отображающий идентификатор нграммы в список термов;
+            # строки матрицы идут по возрастанию, поэтому списки отсортированы, как и постинги CSR
+            for ind in zip(encoded_words.row, encoded_words.col):
+                self.index[ind[1]].append(ind[0])
 
         print("Speller fitted in", time.time() - checkpoint)
 
@@ -106,54 +129,166 @@ class StatisticalSpeller(object):
 
     def fit_texts(self, texts):
         checkpoint = time.time()
-        words_vocab = self.voc_vectorizer.fit_transform(texts).tocoo()
-        self.voc = dict(zip(
-            sorted(self.voc_vectorizer.vocabulary_.values()),
-            words_vocab.sum(axis=0).A1))
+        self.cache.invalidate()
+        words_vocab = self.voc_vectorizer.fit_transform(texts)
+
+        # замораживаем частоты биграм в таблицу, чтобы не вызывать векторайзер при исправлении
+        self.context = BigramContextTable.from_vectorizer(self.voc_vectorizer, words_vocab)
 
         print("Speller fitted for texts in", time.time() - checkpoint)
 
-    @lru_cache(maxsize=1000000)
+    def save(self, path):
+        """
+            Сохранение подогнанного спеллера в каталог: список слов, нграмный индекс
+            и таблица контекста хранятся в .npy-файлах, которые при загрузке отображаются в память
+        """
+        os.makedirs(path, exist_ok=True)
+
+        if self.index_mode == 'csr':
+            indptr, indices = self.index_indptr, self.index_indices
+        else:
+            postings = [self.index.get(token_id, []) for token_id in range(len(self.vectorizer.vocabulary_))]
+            indptr = np.zeros(len(postings) + 1, dtype=np.int64)
+            np.cumsum([len(posting) for posting in postings], out=indptr[1:])
+            indices = np.fromiter((word_id for posting in postings for word_id in posting),
+                                  dtype=np.int32, count=indptr[-1])
+
+        np.save(os.path.join(path, 'index_indptr.npy'), indptr)
+        np.save(os.path.join(path, 'index_indices.npy'), indices)
+
+        words_pool = self.words_list if isinstance(self.words_list, StringPool) \
+            else StringPool.from_strings(self.words_list)
+        words_pool.save(path, 'words')
+        WordDawg().collect(words_pool).save(path)
+        self.context.save(path)
+
+        with codecs.open(os.path.join(path, 'speller.json'), 'w', encoding='utf-8') as f:
+            json.dump({
+                'n_candidates': self.n_candidates,
+                'ngrams': {ngram: int(ngram_id) for ngram, ngram_id in self.vectorizer.vocabulary_.items()}
+            }, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path, mmap=True, cache=None):
+        """
+            Загрузка спеллера, сохранённого методом save, без повторной подгонки
+        :param path: каталог с моделью
+        :param mmap: отображать массивы в память, чтобы процессы-воркеры делили одни и те же страницы
+        :param cache: кэш исправлений загруженного спеллера
+        """
+        checkpoint = time.time()
+
+        with codecs.open(os.path.join(path, 'speller.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+
+        speller = cls(n_candidates_search=meta['n_candidates'], index_mode='csr', cache=cache)
+        speller.cache.invalidate()
+        speller.vectorizer = CountVectorizer(analyzer="char_wb", ngram_range=(2, 3), binary=True,
+                                             vocabulary=meta['ngrams'])
+
+        mmap_mode = 'r' if mmap else None
+        speller.index_indptr = np.load(os.path.join(path, 'index_indptr.npy'), mmap_mode=mmap_mode)
+        speller.index_indices = np.load(os.path.join(path, 'index_indices.npy'), mmap_mode=mmap_mode)
+        speller.words_list = StringPool.load(path, 'words', mmap)
+        speller.context = BigramContextTable.load(path, mmap=mmap)
+
+        print("Speller loaded in", time.time() - checkpoint)
+
+        return speller
+
     def rectify(self, word, prev_word):
         """
             Предсказания спеллера
         """
+        correction = self.cache.get((word, prev_word))
+        if correction is None:
+            correction = self.__rectify(word, prev_word)
+            self.cache.put((word, prev_word), correction)
+        return correction
 
-        if word == ',,':
-            return ','
-        if word == '..':
-            return '...'
+    def __rectify(self, word, prev_word):
+        if word in self.__punct_fixes:
+            return self.__punct_fixes[word]
 
         # запрос, преобразованный в нграммы
         char_ngrams_list = self.vectorizer.transform([word]).tocoo().col
 
+        # среди топа по совпадениям по нграммам ищем "хорошее" исправление
+        suggests = self.__measure_candidates(word, char_ngrams_list)
+        context_counts = [self.context.context_counts(prev_word, sugg) for sugg, _ in suggests]
+
+        return self.__choose_suggest(word, suggests, context_counts)
+
+    def rectify_batch(self, words, prev_words):
+        """
+            Пакетные предсказания спеллера: нграммы всех запросов векторизуются одним вызовом
+        :param words: слова с опечатками
+        :param prev_words: левые соседи слов
+        :return: исправления в порядке запросов
+        """
+        corrections, queries = {}, []
+        for query in dict.fromkeys(zip(words, prev_words)):
+            correction = self.cache.get(query)
+            if correction is None and query[0] in self.__punct_fixes:
+                correction = self.__punct_fixes[query[0]]
+                self.cache.put(query, correction)
+
+            if correction is not None:
+                corrections[query] = correction
+            else:
+                queries.append(query)
+
+        if queries:
+            encoded_words = self.vectorizer.transform([word for word, _ in queries]).tocsr()
+            suggests_list = [
+                self.__measure_candidates(word, encoded_words.indices[encoded_words.indptr[i]:encoded_words.indptr[i + 1]])
+                for i, (word, _) in enumerate(queries)
+            ]
+
+            for (word, prev_word), suggests in zip(queries, suggests_list):
+                context_counts = [self.context.context_counts(prev_word, sugg) for sugg, _ in suggests]
+                corrections[(word, prev_word)] = self.__choose_suggest(word, suggests, context_counts)
+                self.cache.put((word, prev_word), corrections[(word, prev_word)])
+
+        return [corrections[query] for query in zip(words, prev_words)]
+
+    def __measure_candidates(self, word, char_ngrams_list):
+        """
+            Кандидаты из топа по совпадениям нграмм, отстоящие от запроса не более чем на 5 правок
+        :return: список пар (кандидат, расстояние)
+        """
+
         # подбираем число кандидатов по длине запроса
         self.n_candidates = 350 if len(word) <= 4 else 250 if len(word) <= 7 else self.n_candidates
 
-        # для каждого терма считаем совпадение по нграммам
-        counter = Counter()
+        # используем модифицированное расстояние Левенштейна (с перестановками),
+        # битовое ядро бросает кандидата, как только расстояние заведомо больше 5
+        candidates = [self.words_list[word_id] for word_id in self.__search_candidates(char_ngrams_list)]
+        distances = damerau_levenshtein_distance_many(word, candidates, max_dist=5)
 
-        for token_id in char_ngrams_list:
-            for word_id in self.index[token_id]:
-                counter[word_id] += 1
+        return [(sugg, dist) for sugg, dist in zip(candidates, distances) if dist <= 5]
 
-        # среди топа по совпадениям по нграммам ищем "хорошее" исправление
+    @staticmethod
+    def __choose_suggest(word, suggests, context_counts):
+        """
+            Выбор исправления: ищем слово с минимальным расстоянием и минимальным количеством новых букв,
+            при равенстве предпочитаем более частый в корпусе контекст
+        :param suggests: список пар (кандидат, расстояние)
+        :param context_counts: частоты известных биграм контекста для каждого кандидата
+        """
+        # кандидатов без общих нграмм нет (латиница, символы вне словаря), оставляем слово как есть
+        if not suggests:
+            return word
 
-        # используем модифицированное расстояние Левенштейна (с перестановками)
-        # а также ищем слово с минимальным количеством новых букв
-        suggests = list()
-        for suggest in counter.most_common(n=self.n_candidates):
-            sugg = self.words_list[suggest[0]]
-            dist = damerau_levenshtein_distance(sugg, word)
-            context_list = self.voc_vectorizer.transform([f"{prev_word} {sugg}"]).tocoo().col.tolist()
-            if dist <= 5:
-                suggs = [(sugg, dist, 0.0)]
-                if context_list:
-                    suggs = [(sugg, dist, self.voc.get(context, 0.0)) for context in context_list]
+        scored_suggests = list()
+        for (sugg, dist), counts in zip(suggests, context_counts):
+            suggs = [(sugg, dist, 0.0)]
+            if counts:
+                suggs = [(sugg, dist, count) for count in counts]
 
-                suggests.extend(suggs)
+            scored_suggests.extend(suggs)
 
-        suggests = sorted(suggests, key=lambda tup: tup[1])
+        suggests = sorted(scored_suggests, key=lambda tup: tup[1])
 
         minimal_distance = min(suggest[1] for suggest in suggests)
         candidates = sorted(
@@ -163,216 +298,86 @@ class StatisticalSpeller(object):
 
         return candidates[0][0] if candidates and candidates[0][1] > 0 else suggests[0][0]
 
-    # ищем тег среди разборов одного слова
-    def __tag_in_parse(self, tag_name, word):
-        return any(tag_name in parse.tag for parse in self.morph.parse(word))
+    def __search_candidates(self, char_ngrams_list):
+        """
+            Идентификаторы термов, отсортированные по убыванию числа общих с запросом нграмм
+        """
+        if self.index_mode == 'csr':
+            return self.__search_candidates_csr(char_ngrams_list)
 
-    # строим эвристики для битых предлогов
-    def need_fix_prep(self, word, prep):
-        if prep == 'е':
-            if self.__tag_in_parse('VERB', word) \
-                    or word in ['только', 'более', 'менее', 'больше', 'меньше']:
-                return 'не'
-            else:
-                return prep
-        elif prep == 'аа':
-            return 'а'
-        elif prep == 'даа' or prep == 'дда':
-            return 'да'
-        elif prep == 'ии':
-            return 'и'
-        elif prep == 'илли' or prep == 'иили':
-            return 'или'
-        elif prep == 'отт':
-            return 'от'
-        elif prep == 'ри':
-            return 'при'
-        elif prep in ['ыб', 'бл']:
-            return 'был'
-        elif prep in ['ым', 'ыт', 'ыв']:
-            return prep[::-1]
-        elif prep in ['зи', 'ов', 'од', 'ан', 'оп', 'ми', 'хи', 'ен']:
-            if not self.__tag_in_parse('PREP', word):
-                return prep[::-1]
-            else:
-                return prep
-        elif prep == 'аз':
-            if self.__tag_in_parse('accs', word):
-                return prep[::-1]
-            elif 'VERB' in self.morph.parse(word)[0].tag:
-                return 'раз'
-            else:
-                return prep
-        elif prep == 'в':
-            if word == 'время':
-                return 'во'
-            else:
-                return prep
-        elif prep == 'д':
-            if word not in string.punctuation \
-                    and word not in '.. ... ,,'.split():
-                return 'до'
-            else:
-                return prep
-        elif prep == 'з':
-            if len(word) > 1:
-                if self.__tag_in_parse('gent', word):
-                    return 'из'
-                elif self.__tag_in_parse('accs', word) \
-                        or self.__tag_in_parse('ablt', word):
-                    return 'за'
-                else:
-                    return prep
-            else:
-                return prep
-        elif prep == 'н':
-            if len(word) > 1:
-                if self.__tag_in_parse('accs', word) \
-                        or self.__tag_in_parse('loct', word) \
-                        or self.__tag_in_parse('loc2', word):
-                    return 'на'
-                elif 'VERB' in self.morph.parse(word)[0].tag:
-                    return 'он'
-                else:
-                    return prep
-            else:
-                return prep
-        elif prep == 'п':
-            if self.__tag_in_parse('datv', word) \
-                    or self.__tag_in_parse('loct', word) \
-                    or self.__tag_in_parse('loc2', word) or word.isdigit():
-                return 'по'
-            else:
-                return prep
-        elif prep == 'т':
-            if len(word) > 1:
-                if self.__tag_in_parse('gent', word):
-                    return 'от'
-                elif self.__tag_in_parse('ablt', word) or word in ['же', 'есть']:
-                    return 'то'
-                elif self.__tag_in_parse('femn', word):
-                    return 'та'
-                else:
-                    return prep
-            else:
-                return prep
-        elif prep == 'х':
-            if word not in string.punctuation and not word.isdigit():
-                return 'их'
-            else:
-                return prep
-        elif prep == 'чо':
-            return 'что'
-        elif prep == 'о':
-            if word == 'время':
-                return 'во'
-            else:
-                return prep
-        elif prep == 'ноо':
-            if not word.isalpha():
-                return 'но'
-            else:
-                return prep
-        elif prep == 'кк':
-            if 'datv' in self.morph.parse(word)[0].tag:
-                return 'к'
-            elif word not in string.punctuation:
-                return 'как'
-            else:
-                return prep
-        elif prep == 'оо':
-            if self.__tag_in_parse('loct', word):
-                return 'о'
-            else:
-                return prep
-        elif prep == 'сс':
-            if self.__tag_in_parse('gent', word) \
-                    or self.__tag_in_parse('ablt', word) \
-                    or self.year.search(word):
-                return 'с'
-            else:
-                return prep
-        elif self.on_prep.search(prep):
-            if self.__tag_in_parse('accs', word) \
-                    or self.__tag_in_parse('loct', word) \
-                    or self.__tag_in_parse('loc2', word) \
-                    or word.isdigit():
-                return 'на'
-            else:
-                return prep
-        elif prep == 'пр':
-            if self.__tag_in_parse('loct', word):
-                return 'при'
-            elif self.__tag_in_parse('accs', word):
-                return 'про'
-            else:
-                return prep
-        elif prep == 'эо':
-            return 'это'
-        elif prep == 'эт':
-            if self.__tag_in_parse('femn', word):
-                if self.__tag_in_parse('accs', word):
-                    return 'эту'
-                elif self.__tag_in_parse('gent', word) \
-                        or self.__tag_in_parse('datv', word):
-                    return 'этой'
-                else:
-                    return 'эта'
-            elif self.__tag_in_parse('masc', word) \
-                    and not self.__tag_in_parse('ablt', word):
-                return 'этот'
-            else:
-                return 'это'
-        else:
-            return prep
-
-    def need_fix_prep_after_words(self, word, prep, next_word, ind):
-        if prep == 'вв':
-            if ind == 0 or (ind - 1 >= 0 and 'ivx' not in word):
-                return 'в'
-            elif next_word == 'время':
-                return 'во'
-            else:
-                return prep
-        elif prep == 'тс' and ind - 1 >= 0 and word.isdigit():
-            return 'тыс'
-        elif prep == 'мк' and word.isdigit():
-            return prep[::-1]
-        elif prep == 'е':
-            if word in self.__pron_set:
-                return 'же'
-            elif self.__tag_in_parse('Name', word):
-                return 'де'
-            elif next_word != '' and next_word not in string.punctuation:
-                return 'ее'
-            else:
-                return prep
-        elif prep == 'ж':
-            if word in self.__pron_set:
-                return 'же'
-            else:
-                return prep
-        elif prep == 'ил':
-            if self.__tag_in_parse('VERB', word):
-                return 'ли'
-            else:
-                return 'или'
-        else:
-            return prep
+        # для каждого терма считаем совпадение по нграммам
+        counter = Counter()
 
+        for token_id in char_ngrams_list:
+            for word_id in self.index[token_id]:
+                counter[word_id] += 1
 
-if __name__ == "__main__":
+        return [word_id for word_id, _ in counter.most_common(n=self.n_candidates)]
 
-    np.random.seed(0)
+    def __search_candidates_csr(self, char_ngrams_list):
+        """
+            Векторизованный подсчёт совпадений по CSR-индексу.
+            При равном числе совпадений раньше идёт терм, встретившийся в более ранней нграмме запроса
+            (как в Counter.most_common)
+        """
+        indptr, indices = self.index_indptr, self.index_indices
+        postings = [indices[indptr[token_id]:indptr[token_id + 1]] for token_id in char_ngrams_list]
+        if not postings:
+            return []
+
+        word_ids, first_seen, counts = np.unique(np.concatenate(postings), return_index=True, return_counts=True)
+        if not word_ids.size:
+            return []
+
+        # argpartition отбирает топ за линейное время, затем добираем всех,
+        # кто набрал столько же совпадений, сколько последний из топа, и упорядочиваем
+        n = min(self.n_candidates, word_ids.size)
+        threshold = counts[np.argpartition(-counts, n - 1)[:n]].min()
+        top = np.flatnonzero(counts >= threshold)
+        top = top[np.lexsort((first_seen[top], -counts[top]))][:n]
+
+        return word_ids[top].tolist()
 
+
+def correct_text(speller, words_dict, text):
+    """
+        Исправление одного текста: для каждого слова, отсутствующего в словаре, подбираем наилучшее исправление,
+        далее при наличии слева стопслова с опечаткой пытаемся его исправить с помощью простых эвристик
+    :return: пара (текст, были ли исправления)
+    """
+    mispelled_tokens = text.split()
+    was_rectified = False
+
+    for j, mispelled_token in enumerate(mispelled_tokens):
+        in_dict = mispelled_token.lower() in words_dict
+        if mispelled_token not in all_stopwords and not in_dict:
+            prev_token = mispelled_tokens[j - 1] if j > 0 else '^'
+            rectified_token = speller.rectify(mispelled_token, prev_token)
+            mispelled_tokens[j] = rectified_token
+            if j - 1 >= 0:
+                mispelled_tokens[j - 1] = speller.need_fix_prep(rectified_token, mispelled_tokens[j - 1])
+            was_rectified = True
+        elif in_dict:
+            mispelled_tokens[j - 1] = speller.need_fix_prep(mispelled_token, mispelled_tokens[j - 1])
+            nw = mispelled_tokens[j + 1] if j + 1 < len(mispelled_tokens) else ''
+            mispelled_tokens[j] = speller.need_fix_prep_after_words(mispelled_tokens[j - 1],
+                                                                    mispelled_token, nw, j)
+            was_rectified = True
+
+    return (" ".join(mispelled_tokens), True) if was_rectified else (text, False)
+
+
+def make_submission(speller, submission_path="baseline_submission.csv"):
+    """
+        Подгонка спеллера на словаре и текстах соревнования, исправление выборки
+        с подсчётом времени и запись сабмита
+    """
     # зачитываем словарь "правильных слов"
     words_set = set(line.strip() for line in codecs.open("../resources/words_dict.txt", "r", encoding="utf-8"))
-    
-    words_dict = WordDict()
+
+    words_dict = WordDawg()
     words_dict.collect(words_set)
 
-    # создаём спеллер
-    speller = StatisticalSpeller()
     speller.fit(sorted(list(words_set)))
 
     # читаем выборку из правильных текстов
@@ -399,31 +404,9 @@ if __name__ == "__main__":
             print("Rows processed", counts)
 
         start = time.time()
-        mispelled_text = df["text"][i]
-        mispelled_tokens = mispelled_text.split()
-
-        was_rectified = False
-
-        # для каждого слова из текста поступаем следующим образом:
-        # если слово отсутствует в словаре, то подбираем ему наилучшее исправление
-        # далее при наличие слева стопслова с опечаткой пытаемся его исправить с помощью простых эвристик
-        for j, mispelled_token in enumerate(mispelled_tokens):
-            if mispelled_token not in all_stopwords and mispelled_token not in words_dict:
-                prev_token = mispelled_tokens[j - 1] if j > 0 else '^'
-                rectified_token = speller.rectify(mispelled_token, prev_token)
-                mispelled_tokens[j] = rectified_token
-                if j - 1 >= 0:
-                    mispelled_tokens[j - 1] = speller.need_fix_prep(rectified_token, mispelled_tokens[j - 1])
-                was_rectified = True
-            elif mispelled_token in words_dict:
-                mispelled_tokens[j - 1] = speller.need_fix_prep(mispelled_token, mispelled_tokens[j - 1])
-                nw = mispelled_tokens[j + 1] if j + 1 < len(mispelled_tokens) else ''
-                mispelled_tokens[j] = speller.need_fix_prep_after_words(mispelled_tokens[j - 1],
-                                                                        mispelled_token, nw, j)
-                was_rectified = True
+        mispelled_text, was_rectified = correct_text(speller, words_dict, df["text"][i])
 
         if was_rectified:
-            mispelled_text = " ".join(mispelled_tokens)
             total_rectification_time += time.time() - start
             total_sentences_rectifications += 1.0
 
@@ -435,5 +418,11 @@ if __name__ == "__main__":
     print("average speller time", total_rectification_time / float(total_sentences_rectifications))
 
     submission = pd.DataFrame({"id": df["id"], "text": y_submission}, columns=["id", "text"])
-    submission.to_csv("baseline_submission.csv", index=None, encoding="utf-8", quotechar='"',
+    submission.to_csv(submission_path, index=None, encoding="utf-8", quotechar='"',
                       quoting=csv.QUOTE_NONNUMERIC)
+
+
+if __name__ == "__main__":
+
+    np.random.seed(0)
+    make_submission(StatisticalSpeller())
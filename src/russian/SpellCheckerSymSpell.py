@@ -0,0 +1,113 @@
+"""
+    Simple spell-checker with symmetric delete index (SymSpell)
+    https://www.kaggle.com/c/csc-iinlp-2017-please-feax-me/
+"""
+import time
+
+import numpy as np
+import pymorphy2
+from sklearn.feature_extraction.text import CountVectorizer
+
+from BigramContextTable import BigramContextTable
+from PrepositionRules import PREP_AFTER_WORDS_RULES, PREP_RULES, PrepositionFixer
+from SpellerCache import LRUCache
+from SpellingSymSpell import SymSpellIndex
+
+
+class StatisticalSpellerSymSpell(PrepositionFixer):
+    """
+        Поиск слов на расстоянии Дамерау-Левенштейна не больше max_distance по индексу удалений
+        и последующее ранжирование по эвристике-близости
+    """
+    @staticmethod
+    def tokenize(text):
+        return ['^'] + [t for t in text.split()] + ['$']
+
+    def __init__(self, max_distance=2, prefix_length=7, cache=None, tags_cache_size=100000,
+                 prep_rules=PREP_RULES, prep_after_words_rules=PREP_AFTER_WORDS_RULES):
+        """
+        :param max_distance: максимальное расстояние до кандидатов, для него предпосчитываются удаления
+        :param prefix_length: удаления строятся только по префиксу слова этой длины
+        :param cache: кэш исправлений (LRUCache, TinyLFUCache), по умолчанию LRU на миллион пар слов
+        :param tags_cache_size: число слов в кэше морфологических тегов
+        :param prep_rules: правила для битых предлогов перед словом (см. PrepositionRules)
+        :param prep_after_words_rules: правила для битых предлогов после слова
+        """
+        super().__init__(pymorphy2.MorphAnalyzer(), prep_rules, prep_after_words_rules, tags_cache_size)
+
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.cache = cache if cache is not None else LRUCache(maxsize=1000000)
+
+        # векторайзер для частотного словаря
+        self.voc_vectorizer = CountVectorizer(tokenizer=self.tokenize, ngram_range=(2, 2))
+
+        # частотная таблица биграм контекста по корпусу текстов
+        self.context = BigramContextTable()
+        self.words_list = None
+
+    def fit(self, words_list):
+        """
+            Подгонка спеллера
+        """
+
+        checkpoint = time.time()
+        self.cache.invalidate()
+        self.words_list = SymSpellIndex(self.max_distance, self.prefix_length).build(words_list)
+        print("Speller fitted in", time.time() - checkpoint)
+
+        return self
+
+    def fit_texts(self, texts):
+        checkpoint = time.time()
+        self.cache.invalidate()
+        words_vocab = self.voc_vectorizer.fit_transform(texts)
+
+        # замораживаем частоты биграм в таблицу, чтобы не вызывать векторайзер при исправлении
+        self.context = BigramContextTable.from_vectorizer(self.voc_vectorizer, words_vocab)
+
+        print("Speller fitted for texts in", time.time() - checkpoint)
+
+    def rectify(self, word, prev_word):
+        """
+            Предсказания спеллера
+        """
+        correction = self.cache.get((word, prev_word))
+        if correction is None:
+            correction = self.__rectify(word, prev_word)
+            self.cache.put((word, prev_word), correction)
+        return correction
+
+    def __rectify(self, word, prev_word):
+        # индекс сразу возвращает кандидатов с расстоянием Дамерау-Левенштейна (с перестановками)
+        candidates = self.words_list.search(word)
+
+        # кандидатов в пределах max_distance нет, оставляем слово как есть
+        if not candidates:
+            return word
+
+        # среди кандидатов ищем "хорошее" исправление
+        # а также ищем слово с минимальным количеством новых букв
+        suggests = list()
+        for sugg, dist in candidates:
+            counts = self.context.context_counts(prev_word, sugg)
+            suggs = [(sugg, dist, 0.0)]
+            if counts:
+                suggs = [(sugg, dist, count) for count in counts]
+
+            suggests.extend(suggs)
+
+        minimal_distance = suggests[0][1]
+        candidates = sorted(
+            [(suggest[0], suggest[2]) for suggest in suggests
+             if suggest[1] == minimal_distance and set(suggest[0]) == set(word)],
+            key=lambda tup: -tup[1])
+
+        return candidates[0][0] if candidates and candidates[0][1] > 0 else suggests[0][0]
+
+
+if __name__ == "__main__":
+    from SpellChecker import make_submission
+
+    np.random.seed(0)
+    make_submission(StatisticalSpellerSymSpell())
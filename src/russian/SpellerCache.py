@@ -0,0 +1,209 @@
+"""
+    Bounded per-instance caches for spell-checker corrections
+"""
+import sys
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+import numpy as np
+
+
+def entry_size(key, value) -> int:
+    """
+    Approximate memory footprint of a cache entry in bytes (tuples are measured item by item)
+    """
+    size = 0
+    for item in (key, value):
+        size += sys.getsizeof(item)
+        if isinstance(item, tuple):
+            size += sum(sys.getsizeof(part) for part in item)
+    return size
+
+
+class LRUCache:
+    """
+        Least recently used cache bounded by the number of entries and/or by their total size in bytes.
+        Counts hits, misses and evictions
+    """
+
+    def __init__(self, maxsize: Optional[int] = 100000, maxbytes: Optional[int] = None,
+                 sizeof: Callable[[Any, Any], int] = entry_size):
+        """
+        :param maxsize: maximum number of entries, None for no limit
+        :param maxbytes: maximum total size of entries in bytes, None for no limit
+        :param sizeof: function (key, value) -> size of the entry in bytes
+        """
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.sizeof = sizeof
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = self.misses = self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.entries
+
+    def get(self, key: Hashable, default=None):
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key][0]
+
+        self.misses += 1
+        return default
+
+    def put(self, key: Hashable, value) -> None:
+        if key in self.entries:
+            self.__pop(key)
+
+        size = self.sizeof(key, value) if self.maxbytes is not None else 0
+        if self.maxbytes is not None and size > self.maxbytes:
+            return
+
+        while self.entries and self._is_full(size):
+            if not self._admit(key):
+                return
+            self.__pop(next(iter(self.entries)))
+            self.evictions += 1
+
+        self.entries[key] = (value, size)
+        self.nbytes += size
+
+    def invalidate(self) -> None:
+        """
+        Drops all entries, call it after the owner is re-fitted
+        """
+        self.entries.clear()
+        self.nbytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self.entries),
+            'bytes': self.nbytes
+        }
+
+    def _is_full(self, size: int) -> bool:
+        return (self.maxsize is not None and len(self.entries) >= self.maxsize) or \
+               (self.maxbytes is not None and self.nbytes + size > self.maxbytes)
+
+    def _admit(self, key: Hashable) -> bool:
+        return True
+
+    def __pop(self, key: Hashable) -> None:
+        _, size = self.entries.pop(key)
+        self.nbytes -= size
+
+
+class CountMinSketch:
+    """
+        Approximate access frequencies with 4-bit saturating counters, which are halved
+        every `sample_size` increments so that old popularity fades out
+    """
+    __MAX_COUNT = 15
+
+    def __init__(self, width: int, depth=4, sample_size: Optional[int] = None):
+        self.width = 1 << max(4, (width - 1).bit_length())
+        self.depth = depth
+        self.sample_size = sample_size or 10 * self.width
+        self.counters = np.zeros((depth, self.width), dtype=np.uint8)
+        self.additions = 0
+
+    def __indices(self, key: Hashable):
+        return [hash((seed, key)) & (self.width - 1) for seed in range(self.depth)]
+
+    def increment(self, key: Hashable) -> None:
+        for row, col in enumerate(self.__indices(key)):
+            if self.counters[row, col] < self.__MAX_COUNT:
+                self.counters[row, col] += 1
+
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            self.counters >>= 1
+            self.additions //= 2
+
+    def estimate(self, key: Hashable) -> int:
+        return int(min(self.counters[row, col] for row, col in enumerate(self.__indices(key))))
+
+
+class TinyLFUCache(LRUCache):
+    """
+        LRU cache with TinyLFU admission: a new entry replaces the LRU victim
+        only if it has been requested more often than the victim
+    """
+
+    def __init__(self, maxsize: Optional[int] = 100000, maxbytes: Optional[int] = None,
+                 sizeof: Callable[[Any, Any], int] = entry_size, sketch_width: Optional[int] = None):
+        """
+        :param sketch_width: number of counters per sketch row, defaults to maxsize
+        """
+        super().__init__(maxsize, maxbytes, sizeof)
+        self.sketch = CountMinSketch(sketch_width or maxsize or 100000)
+        self.rejections = 0
+
+    def get(self, key: Hashable, default=None):
+        self.sketch.increment(key)
+        return super().get(key, default)
+
+    def invalidate(self) -> None:
+        super().invalidate()
+        self.sketch = CountMinSketch(self.sketch.width, self.sketch.depth, self.sketch.sample_size)
+
+    def stats(self) -> Dict[str, int]:
+        stats = super().stats()
+        stats['rejections'] = self.rejections
+        return stats
+
+    def _admit(self, key: Hashable) -> bool:
+        victim = next(iter(self.entries))
+        if self.sketch.estimate(key) > self.sketch.estimate(victim):
+            return True
+
+        self.rejections += 1
+        return False
+
+
+if __name__ == '__main__':
+
+    # Test LRU eviction by entries
+    cache = LRUCache(maxsize=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert 'b' not in cache and 'a' in cache and 'c' in cache
+    assert cache.get('b') is None
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'evictions': 1, 'size': 2, 'bytes': 0}
+
+    cache.invalidate()
+    assert not len(cache) and cache.get('a') is None
+
+    # Test LRU eviction by bytes
+    cache = LRUCache(maxsize=None, maxbytes=100, sizeof=lambda key, value: len(value))
+    cache.put('a', 'x' * 60)
+    cache.put('b', 'x' * 30)
+    cache.put('c', 'x' * 30)
+    assert 'a' not in cache and cache.stats()['bytes'] == 60
+    cache.put('d', 'x' * 101)
+    assert 'd' not in cache
+
+    # Test TinyLFU admission: a rare key does not push out a popular one
+    cache = TinyLFUCache(maxsize=1)
+    cache.put('popular', 1)
+    for _ in range(5):
+        cache.get('popular')
+    cache.get('rare')
+    cache.put('rare', 2)
+    assert 'popular' in cache and 'rare' not in cache
+    assert cache.stats()['rejections'] == 1
+
+    for _ in range(10):
+        cache.get('rare')
+    cache.put('rare', 2)
+    assert 'rare' in cache and 'popular' not in cache
+    assert cache.stats()['evictions'] == 1
@@ -0,0 +1,157 @@
+"""
+    Parallel streaming pipeline for correcting large CSV files with the statistical spell-checker
+"""
+import csv
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from SpellChecker import StatisticalSpeller, correct_text
+from WordDawg import WordDawg
+
+# спеллер и словарь процесса-воркера, отображаются в память один раз при старте воркера
+_speller = None
+_words_dict = None
+
+
+def _init_worker(model_path):
+    global _speller, _words_dict
+    _speller = StatisticalSpeller.load(model_path, mmap=True)
+    _words_dict = WordDawg.load(model_path, mmap=True)
+
+
+def _correct_chunk(texts):
+    """
+        Исправление пачки текстов в воркере
+    :return: исправленные тексты, число исправленных текстов, число текстов с ошибкой исправления, время работы
+    """
+    start = time.time()
+    corrected, rectified, failed = [], 0, 0
+    for text in texts:
+        try:
+            text, was_rectified = correct_text(_speller, _words_dict, text)
+        except Exception:
+            # одна строка не должна обрывать многочасовой прогон: оставляем текст как есть и считаем его
+            was_rectified = False
+            failed += 1
+        corrected.append(text)
+        rectified += was_rectified
+    return corrected, rectified, failed, time.time() - start
+
+
+class PipelineStats:
+    """
+        Счётчики пропускной способности и задержек конвейера
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.rectified_rows = 0
+        self.failed_rows = 0
+        self.chunks = 0
+        self.elapsed = 0.0
+        self.worker_latencies = []
+        self.chunk_latencies = []
+
+    def add_chunk(self, rows, rectified_rows, failed_rows, worker_latency, chunk_latency):
+        self.rows += rows
+        self.rectified_rows += rectified_rows
+        self.failed_rows += failed_rows
+        self.chunks += 1
+        self.worker_latencies.append(worker_latency)
+        self.chunk_latencies.append(chunk_latency)
+
+    def as_dict(self):
+        def percentiles(latencies):
+            if not latencies:
+                return {}
+            return dict(zip(('p50', 'p95', 'p99'), np.percentile(latencies, [50, 95, 99]).tolist()))
+
+        return {
+            'rows': self.rows,
+            'rectified_rows': self.rectified_rows,
+            'failed_rows': self.failed_rows,
+            'chunks': self.chunks,
+            'elapsed': self.elapsed,
+            'rows_per_second': self.rows / self.elapsed if self.elapsed else 0.0,
+            'worker_latency': percentiles(self.worker_latencies),
+            'chunk_latency': percentiles(self.chunk_latencies)
+        }
+
+
+class CorrectionPipeline:
+    """
+        Читает CSV кусками, исправляет куски в пуле процессов, которые делят один отображённый в память
+        спеллер (см. StatisticalSpeller.save), и дописывает результат по мере готовности, сохраняя порядок строк
+    """
+
+    def __init__(self, model_path, n_workers=None, chunk_size=10000, max_pending=None):
+        """
+        :param model_path: каталог со спеллером, сохранённым StatisticalSpeller.save
+        :param n_workers: число процессов, по умолчанию число ядер
+        :param chunk_size: число строк в куске
+        :param max_pending: максимум кусков в работе, ограничивает память; по умолчанию два на воркер
+        """
+        self.model_path = model_path
+        self.n_workers = n_workers or os.cpu_count()
+        self.chunk_size = chunk_size
+        self.max_pending = max_pending or 2 * self.n_workers
+        self.stats = PipelineStats()
+
+    def run(self, input_path, output_path, id_column="id", text_column="text"):
+        """
+            Исправление колонки `text_column` файла `input_path` с записью пар (id, text) в `output_path`
+        :return: счётчики конвейера
+        """
+        self.stats = PipelineStats()
+        start = time.time()
+        pending = deque()
+        header = True
+
+        with ProcessPoolExecutor(max_workers=self.n_workers, initializer=_init_worker,
+                                 initargs=(self.model_path,)) as executor:
+            for chunk in pd.read_csv(input_path, chunksize=self.chunk_size):
+                if len(pending) >= self.max_pending:
+                    header = self.__write_ready(pending.popleft(), output_path, header)
+
+                future = executor.submit(_correct_chunk, chunk[text_column].tolist())
+                pending.append((chunk[id_column].tolist(), future, time.time()))
+
+            while pending:
+                header = self.__write_ready(pending.popleft(), output_path, header)
+
+        self.stats.elapsed = time.time() - start
+        return self.stats
+
+    def __write_ready(self, task, output_path, header):
+        ids, future, submitted = task
+        corrected, rectified, failed, worker_latency = future.result()
+
+        submission = pd.DataFrame({"id": ids, "text": corrected}, columns=["id", "text"])
+        submission.to_csv(output_path, mode="w" if header else "a", header=header, index=None, encoding="utf-8",
+                          quotechar='"', quoting=csv.QUOTE_NONNUMERIC)
+
+        self.stats.add_chunk(len(ids), rectified, failed, worker_latency, time.time() - submitted)
+        return False
+
+
+if __name__ == "__main__":
+    import codecs
+
+    model_path = "../resources/speller_model"
+
+    # подгоняем и сохраняем спеллер один раз, дальше воркеры только отображают его в память
+    if not os.path.exists(model_path):
+        words_set = set(line.strip() for line in codecs.open("../resources/words_dict.txt", "r", encoding="utf-8"))
+
+        speller = StatisticalSpeller(index_mode='csr')
+        speller.fit(sorted(list(words_set)))
+        speller.fit_texts(list(pd.read_csv("../resources/corrected_texts.csv")["text"]))
+        speller.save(model_path)
+
+    pipeline = CorrectionPipeline(model_path, chunk_size=1000)
+    print(pipeline.run("../resources/broken_texts.csv", "baseline_submission.csv").as_dict())
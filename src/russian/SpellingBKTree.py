@@ -1,86 +1,394 @@
+import heapq
+import os
+import zlib
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
 import editdistance
-from typing import Dict, List, Tuple, Set
+import numpy as np
+from typing import List, Optional, Tuple, Set
+
+from BitParallelDistance import levenshtein_distance, levenshtein_distance_many
+from StringPool import StringPool
 
 
 class BKTree:
-    def __init__(self, words_list: List[str], distance: callable):
-        self.root = {}
+    def __init__(self, words_list: List[str], distance: callable, bounded_distance: Optional[callable] = None,
+                 batch_distance: Optional[callable] = None):
+        """
+        :param words_list: words of the dictionary
+        :param distance: metric function (first, second) -> int
+        :param bounded_distance: the same metric with early exit (first, second, max_dist) -> int,
+        which returns any value greater than max_dist when the distance exceeds it
+        :param batch_distance: the bounded metric from one word to many (word, candidates, max_dist) -> List[int],
+        used by search_many, e.g. levenshtein_distance_many
+        """
+        self.root = None
         self.root_word = None
+        self.size = 0
         self.__distance = distance
+        self.__bounded_distance = bounded_distance or (lambda first, second, max_dist: distance(first, second))
+        self.__batch_distance = batch_distance or (
+            lambda word, candidates, max_dist: [self.__bounded_distance(candidate, word, max_dist)
+                                                for candidate in candidates])
         self.__build_bk(words_list)
 
     def __build_bk(self, words_list):
         for word in words_list:
-            if not self.root:
-                self.__add(word, self.root, '')
-                self.root_word = next(iter(self.root))
-            else:
-                self.__add(word, self.root[self.root_word], self.root_word)
+            self.__add(word)
 
-    def __get_element_with_same_distance(self, word: str, node: Dict[str, Dict], dist: int):
+    def __add(self, word: str):
         """
-        Returns a child, whose distance to `word` equals to `dist`
+        Adds new word to the tree
+        A node is a pair (word, children) where children are keyed by their distance to the node word
+        1. If the tree is empty, then the word becomes the root
+        2. Calculate distance `d` between `word` and the node word
+        3. If a child with the edge `d` exists, then descend into it, otherwise attach the word under the edge `d`
         :param word:
-        :param node:
-        :param dist:
-        return (child, parent word)
         """
-        for key in node:
-            if self.__distance(key, word) == dist:
-                return node[key], key
-        return None, None
 
-    def __add(self, word: str, node: Dict[str, Dict], key: str):
+        if self.root is None:
+            self.root = (word, {})
+            self.root_word = word
+            self.size = 1
+            return
+
+        key, children = self.root
+        while True:
+            dist = self.__distance(word, key)
+            if dist == 0:
+                return
+
+            child = children.get(dist)
+            if child is None:
+                children[dist] = (word, {})
+                self.size += 1
+                return
+            key, children = child
+
+    def __len__(self) -> int:
         """
-        Adds new word to the tree
-        1. If the current node is empty, then add to it a pair <word, empty_dict>
-        2. Calculate distance `d` between `word` and `key`
-        3. Check a child node whose distance equals to `d`
-        4. If a child node exists, then add a new word to this child node, otherwise do Point 1
+        Number of distinct words in the tree
+        """
+        return self.size
+
+    def search(self, word: str, n=0) -> Set[Tuple[str, int]]:
+        """
+        Returns a set of candidates for a misspelling word
+        A stack contains those child nodes whose edge distance lies
+        in the interval [d(word, node_key) - N, d(word, node_key) + N].
+        If d(word, node_key) exceeds N plus the largest edge distance, neither the node
+        nor its children can match, so the bounded metric may stop at this threshold
         :param word:
-        :param node:
-        :param key:
+        :param n:
+        return: Set[Tuple[str, int]]
         """
 
-        if not node:
-            node[word] = {}
-            return
+        if self.root is None:
+            return set()
 
-        dist = self.__distance(word, key)
-        child_node, parent_key = self.__get_element_with_same_distance(key, node, dist)
+        stack = [self.root]
+        matches = set()
+        while stack:
+            key, children = stack.pop()
+            dist = self.__bounded_distance(word, key, n + max(children, default=0))
+            if dist <= n:
+                matches.add((key, dist))
 
-        if not child_node and not parent_key:
-            node[word] = {}
-            return
-        else:
-            self.__add(word, child_node, parent_key)
+            stack.extend(children[edge] for edge in range(max(dist - n, 1), dist + n + 1) if edge in children)
+        return matches
+
+    def search_many(self, words: List[str], n=0) -> List[Set[Tuple[str, int]]]:
+        """
+        Returns sets of candidates for many misspelling words at once
+        The tree is traversed once: every node keeps the frontier of queries which reached it,
+        distances from the node word to all of them are computed by one batch call,
+        and each query goes down only the edges within [d - N, d + N]. Repeated words are searched once
+        :param words:
+        :param n:
+        return: List[Set[Tuple[str, int]]], one set per word
+        """
+
+        unique_words = list(dict.fromkeys(words))
+        unique_matches = [set() for _ in unique_words]
+
+        stack = [(self.root, list(range(len(unique_words))))] if self.root is not None and unique_words else []
+        while stack:
+            (key, children), queries = stack.pop()
+            distances = self.__batch_distance(key, [unique_words[query] for query in queries],
+                                              n + max(children, default=0))
+
+            frontier = defaultdict(list)
+            for query, dist in zip(queries, distances):
+                if dist <= n:
+                    unique_matches[query].add((key, dist))
+                for edge in range(max(dist - n, 1), dist + n + 1):
+                    if edge in children:
+                        frontier[edge].append(query)
+
+            stack.extend((children[edge], edge_queries) for edge, edge_queries in frontier.items())
+
+        matches = dict(zip(unique_words, unique_matches))
+        return [set(matches[word]) for word in words]
+
+    def nearest(self, word: str, k=1, max_dist: Optional[int] = None) -> List[Tuple[str, int]]:
+        """
+        Returns k closest words within max_dist
+        Best-first traversal: a subtree hanging on the edge `e` of a node at distance `d` from the word
+        can't contain words closer than |d - e|, so subtrees are visited by this lower bound.
+        As soon as k words are found the radius shrinks to the k-th best distance, and the traversal stops
+        when the lower bound of the next subtree reaches it. Words at the same distance as the k-th one
+        may be returned in any combination
+        :param word:
+        :param k: number of words
+        :param max_dist: maximum distance, unlimited by default
+        return: List[Tuple[str, int]] sorted by distance and word
+        """
+
+        if self.root is None or k <= 0:
+            return []
+
+        radius = max_dist if max_dist is not None else float('inf')
+        # max-heap of the best words: (-distance, word)
+        best = []
+        frontier = [(0, 0, self.root)]
+        counter = 1
+        while frontier:
+            lower_bound, _, (key, children) = heapq.heappop(frontier)
+            if lower_bound > radius:
+                break
+
+            dist = self.__bounded_distance(word, key, radius + max(children, default=0))
+            if dist <= radius:
+                if len(best) < k:
+                    heapq.heappush(best, (-dist, key))
+                else:
+                    heapq.heapreplace(best, (-dist, key))
+                if len(best) == k:
+                    radius = -best[0][0] - 1
+
+            for edge, child in children.items():
+                child_bound = max(lower_bound, abs(dist - edge))
+                if child_bound <= radius:
+                    heapq.heappush(frontier, (child_bound, counter, child))
+                    counter += 1
+
+        return sorted(((key, -neg_dist) for neg_dist, key in best), key=lambda x: x[::-1])
+
+
+class CompactBKTree:
+    """
+        BK-tree flattened into arrays: nodes are numbered in BFS order (the root is 0) and their words
+        lie in a StringPool, edges of the node v lie in [edge_start[v], edge_start[v + 1]) sorted by distance,
+        so the edges within [d - N, d + N] are found by binary search.
+        The arrays can be saved to .npy files and memory-mapped, the metric is given on load
+    """
+
+    def __init__(self, words: StringPool, edge_start: np.ndarray, edge_dist: np.ndarray, edge_child: np.ndarray,
+                 distance: callable, bounded_distance: Optional[callable] = None):
+        """
+        :param words: node words
+        :param edge_start: int64 array of n_nodes + 1 boundaries of node edges
+        :param edge_dist: int32 array of edge distances
+        :param edge_child: int32 array of edge targets
+        :param distance: metric function (first, second) -> int, the same the tree was built with
+        :param bounded_distance: the same metric with early exit (first, second, max_dist) -> int
+        """
+        self.words = words
+        self.edge_start = edge_start
+        self.edge_dist = edge_dist
+        self.edge_child = edge_child
+        self.__bounded_distance = bounded_distance or (lambda first, second, max_dist: distance(first, second))
+
+    @classmethod
+    def build(cls, words_list: List[str], distance: callable,
+              bounded_distance: Optional[callable] = None) -> 'CompactBKTree':
+        tree = BKTree(words_list, distance, bounded_distance)
+
+        nodes = [tree.root] if tree.root is not None else []
+        edge_start, edge_dist, edge_child = [0], [], []
+        for _, children in nodes:
+            for edge in sorted(children):
+                edge_dist.append(edge)
+                edge_child.append(len(nodes))
+                nodes.append(children[edge])
+            edge_start.append(len(edge_dist))
+
+        return cls(StringPool.from_strings(key for key, _ in nodes), np.array(edge_start, dtype=np.int64),
+                   np.array(edge_dist, dtype=np.int32), np.array(edge_child, dtype=np.int32),
+                   distance, bounded_distance)
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def __edges(self, node: int):
+        lo, hi = int(self.edge_start[node]), int(self.edge_start[node + 1])
+        return lo, hi, int(self.edge_dist[hi - 1]) if hi > lo else 0
 
     def search(self, word: str, n=0) -> Set[Tuple[str, int]]:
         """
-        Returns a set of candidates for a misspelling word
-        A stack contains those child nodes whose calculated distance lies
-        in the interval (d(word, node_key) - N, d(word, node_key) + N)
+        Returns a set of candidates for a misspelling word, see BKTree.search
         :param word:
         :param n:
         return: Set[Tuple[str, int]]
         """
 
-        stack = [(self.root[self.root_word], self.root_word)]
+        if not len(self):
+            return set()
+
+        stack = [0]
         matches = set()
         while stack:
-            node, key = stack.pop()
-            dist = self.__distance(word, key)
+            node = stack.pop()
+            key = self.words[node]
+            lo, hi, max_edge = self.__edges(node)
+            dist = self.__bounded_distance(word, key, n + max_edge)
             if dist <= n:
                 matches.add((key, dist))
 
-            for candidate in node:
-                distch = self.__distance(key, candidate)
-                if dist - n <= distch <= dist + n:
-                    stack.append((node[candidate], candidate))
+            first = bisect_left(self.edge_dist, dist - n, lo, hi)
+            last = bisect_right(self.edge_dist, dist + n, first, hi)
+            stack.extend(self.edge_child[first:last].tolist())
         return matches
 
+    def nearest(self, word: str, k=1, max_dist: Optional[int] = None) -> List[Tuple[str, int]]:
+        """
+        Returns k closest words within max_dist, see BKTree.nearest
+        :param word:
+        :param k: number of words
+        :param max_dist: maximum distance, unlimited by default
+        return: List[Tuple[str, int]] sorted by distance and word
+        """
+
+        if not len(self) or k <= 0:
+            return []
+
+        radius = max_dist if max_dist is not None else float('inf')
+        best = []
+        frontier = [(0, 0)]
+        while frontier:
+            lower_bound, node = heapq.heappop(frontier)
+            if lower_bound > radius:
+                break
+
+            key = self.words[node]
+            lo, hi, max_edge = self.__edges(node)
+            dist = self.__bounded_distance(word, key, radius + max_edge)
+            if dist <= radius:
+                if len(best) < k:
+                    heapq.heappush(best, (-dist, key))
+                else:
+                    heapq.heapreplace(best, (-dist, key))
+                if len(best) == k:
+                    radius = -best[0][0] - 1
+
+            first = bisect_left(self.edge_dist, dist - radius, lo, hi)
+            last = bisect_right(self.edge_dist, dist + radius, first, hi)
+            for edge, child in zip(self.edge_dist[first:last].tolist(), self.edge_child[first:last].tolist()):
+                heapq.heappush(frontier, (max(lower_bound, abs(dist - edge)), child))
+
+        return sorted(((key, -neg_dist) for neg_dist, key in best), key=lambda x: x[::-1])
+
+    def save(self, path: str, name='bktree') -> None:
+        os.makedirs(path, exist_ok=True)
+        self.words.save(path, f'{name}_words')
+        for array_name in ('edge_start', 'edge_dist', 'edge_child'):
+            np.save(os.path.join(path, f'{name}_{array_name}.npy'), getattr(self, array_name))
+
+    @classmethod
+    def load(cls, path: str, distance: callable, bounded_distance: Optional[callable] = None,
+             name='bktree', mmap=True) -> 'CompactBKTree':
+        mmap_mode = 'r' if mmap else None
+        arrays = [np.load(os.path.join(path, f'{name}_{array_name}.npy'), mmap_mode=mmap_mode)
+                  for array_name in ('edge_start', 'edge_dist', 'edge_child')]
+        return cls(StringPool.load(path, f'{name}_words', mmap), *arrays, distance, bounded_distance)
+
+
+# tree of the shard, lives in a BKForest worker process
+_shard_tree = None
+
+
+def _build_shard(words_list, distance, bounded_distance, batch_distance):
+    global _shard_tree
+    _shard_tree = BKTree(words_list, distance, bounded_distance, batch_distance)
+    return len(_shard_tree)
+
+
+def _query_shard(method, *args):
+    return getattr(_shard_tree, method)(*args)
+
+
+class BKForest:
+    """
+        The vocabulary is hash-partitioned into shards, every shard tree is built and kept in its own
+        worker process, queries are sent to all shards and their results are merged.
+        The metric functions must be picklable (module-level functions)
+    """
+
+    def __init__(self, words_list: List[str], distance: callable, bounded_distance: Optional[callable] = None,
+                 batch_distance: Optional[callable] = None, n_shards: Optional[int] = None):
+        """
+        :param words_list: words of the dictionary
+        :param distance: metric function, see BKTree
+        :param bounded_distance: the same metric with early exit, see BKTree
+        :param batch_distance: the bounded metric from one word to many, see BKTree
+        :param n_shards: number of shards and worker processes, the number of CPUs by default
+        """
+        self.n_shards = n_shards or os.cpu_count()
+
+        shards = [[] for _ in range(self.n_shards)]
+        for word in words_list:
+            shards[zlib.crc32(word.encode('utf-8')) % self.n_shards].append(word)
+
+        # one process per shard, so queries to a shard always reach the process holding its tree
+        self.executors = [ProcessPoolExecutor(max_workers=1) for _ in range(self.n_shards)]
+        self.shard_sizes = self.__fan_out(
+            [executor.submit(_build_shard, shard, distance, bounded_distance, batch_distance)
+             for executor, shard in zip(self.executors, shards)])
+
+    def __len__(self) -> int:
+        return sum(self.shard_sizes)
+
+    @staticmethod
+    def __fan_out(futures):
+        return [future.result() for future in futures]
+
+    def __query(self, method, *args):
+        return self.__fan_out([executor.submit(_query_shard, method, *args) for executor in self.executors])
+
+    def search(self, word: str, n=0) -> Set[Tuple[str, int]]:
+        """
+        See BKTree.search
+        """
+        return set().union(*self.__query('search', word, n))
+
+    def search_many(self, words: List[str], n=0) -> List[Set[Tuple[str, int]]]:
+        """
+        See BKTree.search_many
+        """
+        return [set().union(*matches) for matches in zip(*self.__query('search_many', list(words), n))]
+
+    def nearest(self, word: str, k=1, max_dist: Optional[int] = None) -> List[Tuple[str, int]]:
+        """
+        See BKTree.nearest, the k closest words of every shard are merged
+        """
+        return heapq.nsmallest(k, (match for matches in self.__query('nearest', word, k, max_dist)
+                                   for match in matches), key=lambda x: x[::-1])
+
+    def close(self) -> None:
+        for executor in self.executors:
+            executor.shutdown()
+
+    def __enter__(self) -> 'BKForest':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
 
 if __name__ == '__main__':
+    import tempfile
 
     # Test BK-tree with standard Levenstein distance
     words = ['hello', 'hallo', 'leetcode', 'hell', 'bell']
@@ -98,3 +406,61 @@ if __name__ == '__main__':
     assert dictionary.search('elloo', 2) == {('hello', 2)}
     assert dictionary.search('elloo', 3) == {('hello', 2), ('hallo', 3), ('hell', 3), ('bell', 3)}
     assert dictionary.search('leetcdoe', 2) == {('leetcode', 2)}
+
+    # Test BK-tree with bounded bit-parallel Levenstein distance
+    dictionary = BKTree(words, levenshtein_distance, bounded_distance=levenshtein_distance)
+
+    assert dictionary.search('hello') == {('hello', 0)}
+    assert dictionary.search('hhllo', 1) == {('hallo', 1), ('hello', 1)}
+    assert dictionary.search('ehllo', 2) == {('hallo', 2), ('hello', 2)}
+    assert dictionary.search('hhllo', 2) == {('hallo', 1), ('hello', 1), ('hell', 2)}
+    assert dictionary.search('hkelo', 2) == {('hallo', 2), ('hell', 2), ('hello', 2)}
+    assert not dictionary.search('hklo')
+    assert dictionary.search('hklo', 3) == {('hallo', 2), ('hell', 2), ('bell', 3), ('hello', 2)}
+    assert dictionary.search('lettcode', 2) == {('leetcode', 1)}
+    assert dictionary.search('hkloo', 2) == {('hallo', 2), ('hello', 2)}
+    assert dictionary.search('elloo', 2) == {('hello', 2)}
+    assert dictionary.search('elloo', 3) == {('hello', 2), ('hallo', 3), ('hell', 3), ('bell', 3)}
+    assert dictionary.search('leetcdoe', 2) == {('leetcode', 2)}
+
+    # Test batched search
+    queries = ['hhllo', 'elloo', 'hklo', 'lettcode', 'hhllo']
+    assert dictionary.search_many(queries, 2) == [dictionary.search(query, 2) for query in queries]
+    assert dictionary.search_many([], 2) == []
+
+    batched = BKTree(words, levenshtein_distance, bounded_distance=levenshtein_distance,
+                     batch_distance=levenshtein_distance_many)
+    assert batched.search_many(queries, 3) == [dictionary.search(query, 3) for query in queries]
+
+    # Test k nearest words
+    assert dictionary.nearest('hello') == [('hello', 0)]
+    assert dictionary.nearest('hhllo', 2) == [('hallo', 1), ('hello', 1)]
+    assert dictionary.nearest('hhllo', 3) == [('hallo', 1), ('hello', 1), ('hell', 2)]
+    assert dictionary.nearest('hklo', 2, max_dist=1) == []
+    assert dictionary.nearest('lettcode', 3, max_dist=2) == [('leetcode', 1)]
+    assert len(dictionary.nearest('hklo', 10)) == len(words)
+
+    # Test compact BK-tree and its serialization
+    compact = CompactBKTree.build(words, levenshtein_distance, bounded_distance=levenshtein_distance)
+
+    assert len(compact) == len(words)
+    assert compact.search('hhllo', 2) == dictionary.search('hhllo', 2)
+    assert compact.search('elloo', 3) == dictionary.search('elloo', 3)
+    assert compact.nearest('hhllo', 3) == [('hallo', 1), ('hello', 1), ('hell', 2)]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        compact.save(tmp_dir)
+        loaded = CompactBKTree.load(tmp_dir, levenshtein_distance, bounded_distance=levenshtein_distance)
+        assert loaded.search('hkelo', 2) == {('hallo', 2), ('hell', 2), ('hello', 2)}
+        assert loaded.search('lettcode', 2) == {('leetcode', 1)}
+        assert loaded.nearest('lettcode', 3, max_dist=2) == [('leetcode', 1)]
+
+    # Test sharded BK-forest
+    assert len(dictionary) == len(words) and len(BKTree(words + words[:2], editdistance.eval)) == len(words)
+
+    with BKForest(words + words[:2], levenshtein_distance, bounded_distance=levenshtein_distance,
+                  batch_distance=levenshtein_distance_many, n_shards=2) as forest:
+        assert len(forest) == len(words)
+        assert forest.search('hkelo', 2) == {('hallo', 2), ('hell', 2), ('hello', 2)}
+        assert forest.search_many(queries, 2) == [dictionary.search(query, 2) for query in queries]
+        assert forest.nearest('hhllo', 3) == [('hallo', 1), ('hello', 1), ('hell', 2)]
@@ -0,0 +1,261 @@
+"""
+    Benchmark of the fuzzy dictionary backends: build time, peak memory, query latency and recall@k
+    on the same word list and the same deterministic corpus of misspellings.
+    Every backend runs in its own freshly spawned process, so the peak RSS of one backend
+    doesn't leak into the numbers of another
+"""
+import codecs
+import json
+import platform
+import random
+import resource
+import sys
+import time
+from collections import Counter, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def _tree_lookup(tree) -> Callable[[str, int, int], List[str]]:
+    """
+    Wraps a structure with search(word, distance) -> [(candidate, distance), ...],
+    candidates are ranked by distance and then alphabetically
+    """
+    def lookup(word, k, max_distance):
+        return [candidate for candidate, _ in sorted(tree.search(word, max_distance), key=lambda x: x[::-1])[:k]]
+    return lookup
+
+
+def _speller_lookup(speller) -> Callable[[str, int, int], List[str]]:
+    """
+    Spellers return the only correction, so for them recall@k equals recall@1 for any k
+    """
+    def lookup(word, k, max_distance):
+        try:
+            return [speller.rectify(word, '^')]
+        except ValueError:
+            # спеллер не нашёл ни одного кандидата
+            return []
+    return lookup
+
+
+# бэкенд: создание (загрузка морфологии и т.п., в память построения не входит),
+# построение по словарю, которое возвращает функцию поиска, и метрика, по которой он ищет
+Backend = namedtuple('Backend', 'setup build metric')
+
+
+def _setup_statistical_speller():
+    from SpellChecker import StatisticalSpeller
+    return StatisticalSpeller()
+
+
+def _setup_statistical_speller_csr():
+    from SpellChecker import StatisticalSpeller
+    return StatisticalSpeller(index_mode='csr')
+
+
+def _setup_bk_tree_speller():
+    from SpellCheckerBkTree import StatisticalSpellerBkTree
+    return StatisticalSpellerBkTree()
+
+
+def _setup_sym_spell_speller():
+    from SpellCheckerSymSpell import StatisticalSpellerSymSpell
+    return StatisticalSpellerSymSpell()
+
+
+def _fit_speller(speller, words):
+    return _speller_lookup(speller.fit(words))
+
+
+def _setup_levenstein_tree():
+    from SpellingTrieLevenstein import SpellingLevensteinTree
+    return SpellingLevensteinTree(use_damerau_modification=True)
+
+
+def _setup_hamming_dictionary():
+    from SpellingTrie import SpellingHammingDictionary
+    return SpellingHammingDictionary()
+
+
+def _fill_dictionary(dictionary, words):
+    dictionary.build_dict(words)
+    return _tree_lookup(dictionary)
+
+
+def _setup_bk_tree():
+    import SpellingBKTree
+    return SpellingBKTree
+
+
+def _build_bk_tree(module, words):
+    from BitParallelDistance import levenshtein_distance
+    return _tree_lookup(module.BKTree(words, levenshtein_distance, bounded_distance=levenshtein_distance))
+
+
+# BK-дерево остаётся на расстоянии Левенштейна: OSA не удовлетворяет неравенству треугольника,
+# и дерево с ней теряло бы кандидатов; перестановка для него стоит две правки, см. recall_by_operation
+BACKENDS = {
+    'StatisticalSpeller': Backend(_setup_statistical_speller, _fit_speller, 'ngram overlap, osa re-rank'),
+    'StatisticalSpeller[csr]': Backend(_setup_statistical_speller_csr, _fit_speller, 'ngram overlap, osa re-rank'),
+    'StatisticalSpellerBkTree': Backend(_setup_bk_tree_speller, _fit_speller, 'levenshtein, osa re-rank'),
+    'StatisticalSpellerSymSpell': Backend(_setup_sym_spell_speller, _fit_speller, 'osa'),
+    'SpellingLevensteinTree': Backend(_setup_levenstein_tree, _fill_dictionary, 'osa'),
+    'BKTree': Backend(_setup_bk_tree, _build_bk_tree, 'levenshtein'),
+    'SpellingHammingDictionary': Backend(_setup_hamming_dictionary, _fill_dictionary, 'hamming'),
+}
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss в килобайтах на Linux и в байтах на macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024.0 * 1024.0) if sys.platform == 'darwin' else peak / 1024.0
+
+
+def _percentiles_ms(latencies: List[float]) -> Dict[str, float]:
+    if not latencies:
+        return {}
+    return dict(zip(('p50', 'p95', 'p99'), (np.percentile(latencies, [50, 95, 99]) * 1000.0).tolist()))
+
+
+OPERATIONS = ('deletion', 'insertion', 'substitution', 'transposition')
+
+
+def make_misspellings(words: Sequence[str], n_queries: int, seed=0) -> List[Tuple[str, str, str]]:
+    """
+    Deterministic corpus of misspellings: one random deletion, insertion, substitution
+    or transposition per word, only strings which are absent in the dictionary are kept
+    :return: list of (misspelling, correct word, operation)
+    """
+    rng = random.Random(seed)
+    words = sorted(set(words))
+    dictionary = set(words)
+    alphabet = sorted(set(''.join(words)))
+    candidates = [word for word in words if len(word) > 2]
+
+    queries, seen = [], set()
+    for _ in range(20 * n_queries):
+        if len(queries) == n_queries or not candidates:
+            break
+
+        word = rng.choice(candidates)
+        i = rng.randrange(len(word))
+        operation = rng.randrange(4)
+        if operation == 0:
+            typo = word[:i] + word[i + 1:]
+        elif operation == 1:
+            typo = word[:i] + rng.choice(alphabet) + word[i:]
+        elif operation == 2:
+            typo = word[:i] + rng.choice(alphabet) + word[i + 1:]
+        else:
+            i = min(i, len(word) - 2)
+            typo = word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+        if typo not in dictionary and typo not in seen:
+            seen.add(typo)
+            queries.append((typo, word, OPERATIONS[operation]))
+
+    return queries
+
+
+def _run_backend(name: str, words: List[str], queries: List[Tuple[str, str, str]],
+                 ks: Sequence[int], max_distance: int) -> Dict:
+    """
+    Runs in a child process: sets up and builds the backend, then replays the corpus.
+    Memory of the setup (e.g. the morphological analyzer of the spellers) is reported apart from the build
+    """
+    backend = BACKENDS[name]
+    rss_start = _peak_rss_mb()
+
+    start = time.perf_counter()
+    model = backend.setup()
+    setup_seconds = time.perf_counter() - start
+    rss_setup = _peak_rss_mb()
+
+    start = time.perf_counter()
+    lookup = backend.build(model, words)
+    build_seconds = time.perf_counter() - start
+    rss_built = _peak_rss_mb()
+
+    max_k = max(ks)
+    latencies, hits = [], {k: Counter() for k in ks}
+    totals = Counter(operation for _, _, operation in queries)
+    for typo, word, operation in queries:
+        start = time.perf_counter()
+        candidates = lookup(typo, max_k, max_distance)
+        latencies.append(time.perf_counter() - start)
+
+        for k in ks:
+            hits[k][operation] += word in candidates[:k]
+
+    return {
+        'metric': backend.metric,
+        'setup_seconds': setup_seconds,
+        'setup_rss_mb': rss_setup - rss_start,
+        'build_seconds': build_seconds,
+        'build_rss_mb': rss_built - rss_setup,
+        'peak_rss_mb': _peak_rss_mb(),
+        'latency_ms': _percentiles_ms(latencies),
+        'queries_per_second': len(queries) / sum(latencies) if sum(latencies) else 0.0,
+        'recall': {f'@{k}': sum(hits[k].values()) / len(queries) if queries else 0.0 for k in ks},
+        'recall_by_operation': {operation: {f'@{k}': hits[k][operation] / total for k in ks}
+                                for operation, total in sorted(totals.items())}
+    }
+
+
+def run_benchmark(words: List[str], queries: List[Tuple[str, str, str]], backends: Optional[Sequence[str]] = None,
+                  ks: Sequence[int] = (1, 5, 10), max_distance=2) -> Dict:
+    """
+    Benchmarks the backends one by one, each in a new process
+    :param words: dictionary words
+    :param queries: list of (misspelling, correct word, operation), see make_misspellings
+    :param backends: names from BACKENDS, all of them by default
+    :param ks: cut-offs for recall@k
+    :param max_distance: edit distance for the backends which search within a radius
+    :return: JSON-serializable report
+    """
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'n_words': len(words),
+        'n_queries': len(queries),
+        'max_distance': max_distance,
+        'backends': {}
+    }
+
+    for name in backends or BACKENDS:
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+            report['backends'][name] = executor.submit(_run_backend, name, list(words), list(queries),
+                                                       list(ks), max_distance).result()
+
+    return report
+
+
+if __name__ == '__main__':
+
+    # Test the corpus generator and a small run of the lightweight backends
+    words = ['hello', 'hallo', 'leetcode', 'hell', 'bell', 'help', 'yellow']
+    queries = make_misspellings(words, 10, seed=1)
+
+    assert queries == make_misspellings(words, 10, seed=1)
+    assert len(queries) == 10 and len({typo for typo, _, _ in queries}) == 10
+    assert all(typo not in words and word in words and operation in OPERATIONS for typo, word, operation in queries)
+
+    report = run_benchmark(words, queries, backends=['BKTree', 'SpellingLevensteinTree'], ks=(1, 5))
+    assert set(report['backends']) == {'BKTree', 'SpellingLevensteinTree'}
+    assert set(report['backends']['BKTree']['latency_ms']) == {'p50', 'p95', 'p99'}
+    assert report['backends']['SpellingLevensteinTree']['recall']['@5'] == 1.0
+    assert report['backends']['BKTree']['metric'] == 'levenshtein'
+    assert set(report['backends']['BKTree']['recall_by_operation']) <= set(OPERATIONS)
+    json.dumps(report)
+
+    # полный прогон на словаре соревнования
+    words = sorted(set(line.strip() for line in codecs.open("../resources/words_dict.txt", "r", encoding="utf-8")))
+    report = run_benchmark(words, make_misspellings(words, 2000))
+
+    with open("spelling_benchmark.json", "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
@@ -0,0 +1,388 @@
+"""
+    Asyncio HTTP server for autocomplete and spelling correction.
+    Models are loaded once, computations run in a worker pool so the event loop stays responsive,
+    identical concurrent queries are computed once and share the result.
+    The pool is either threads sharing the models of the server process or processes
+    which load the models once at start, see SpellingServer.with_process_pool
+"""
+import asyncio
+import bisect
+import functools
+import json
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Optional, Sequence
+from urllib.parse import parse_qs, urlsplit
+
+from Autocomplete import AutoComplete
+
+# модели процесса-воркера, загружаются один раз при старте воркера
+_autocomplete = None
+_speller = None
+
+
+def _init_worker(vocab, top_k, model_path):
+    global _autocomplete, _speller
+    _autocomplete = AutoComplete(vocab=vocab, top_k=top_k)
+    if model_path is not None:
+        from SpellChecker import StatisticalSpeller
+        _speller = StatisticalSpeller.load(model_path, mmap=True)
+
+
+def _complete(autocomplete, prefix, k, max_edits, time_budget):
+    if max_edits > 0:
+        return autocomplete.get_k_fuzzy_completes(prefix, k, max_edits, time_budget)
+    # для k = 1 AutoComplete возвращает одну пару вместо списка
+    completes = autocomplete.get_k_auto_completes(prefix, k)
+    return completes if isinstance(completes, list) else [completes] if completes else []
+
+
+# задачи процесса-воркера: в пул передаются только аргументы запроса
+def _worker_complete(prefix, k, max_edits, time_budget):
+    return _complete(_autocomplete, prefix, k, max_edits, time_budget)
+
+
+def _worker_rectify(word, prev_word):
+    return _speller.rectify(word, prev_word)
+
+
+class BadRequest(Exception):
+    """
+        Malformed request line or query parameters, answered with 400
+    """
+
+
+def _param(params, name, default=None, convert=str):
+    value = params.get(name, default)
+    if value is None:
+        raise BadRequest(f'missing parameter {name}')
+    try:
+        return convert(value)
+    except ValueError:
+        raise BadRequest(f'invalid parameter {name}={value!r}')
+
+
+class LatencyHistogram:
+    """
+        Cumulative histogram of latencies in milliseconds with fixed bucket bounds
+    """
+
+    BOUNDS = (0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+    def __init__(self, bounds: Sequence[float] = BOUNDS):
+        self.bounds = list(bounds)
+        # последний счётчик для латентностей больше всех границ
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, milliseconds: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, milliseconds)] += 1
+        self.count += 1
+        self.total += milliseconds
+        self.max = max(self.max, milliseconds)
+
+    def quantile(self, q: float) -> float:
+        """
+        Upper bound of the bucket which contains the q-quantile, the maximum for the overflow bucket
+        """
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def as_dict(self) -> Dict:
+        return {
+            'count': self.count,
+            'mean_ms': self.total / self.count if self.count else 0.0,
+            'max_ms': self.max,
+            'p50_ms': self.quantile(0.5),
+            'p95_ms': self.quantile(0.95),
+            'p99_ms': self.quantile(0.99),
+            'buckets': {f'le_{bound}': count for bound, count in zip(self.bounds, self.counts)},
+            'overflow': self.counts[-1]
+        }
+
+
+class SpellingServer:
+    """
+        Endpoints (GET, JSON responses):
+        /complete?prefix=...&k=5&max_edits=0 -- completions, fuzzy ones when max_edits > 0
+        /rectify?word=...&prev_word=^ -- speller correction
+        /metrics -- latency histograms and the number of coalesced queries per endpoint
+    """
+
+    REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 500: 'Internal Server Error'}
+
+    def __init__(self, autocomplete: AutoComplete, speller=None, executor: Optional[Executor] = None,
+                 host='127.0.0.1', port=8080, time_budget=0.05):
+        """
+        :param autocomplete: completion model
+        :param speller: StatisticalSpeller or any object with rectify(word, prev_word), optional
+        :param executor: thread pool for computations sharing the loaded models, by default a new one
+        :param host: address to listen on
+        :param port: port to listen on, 0 for any free port
+        :param time_budget: time limit of fuzzy completion in seconds
+        """
+        self.autocomplete = autocomplete
+        self.speller = speller
+        self.executor = executor or ThreadPoolExecutor()
+        self.host = host
+        self.port = port
+        self.time_budget = time_budget
+
+        # кэши спеллера не рассчитаны на конкурентный доступ из нескольких потоков
+        self.speller_lock = threading.Lock()
+
+        # задачи пула: принимают только аргументы запроса
+        self.complete_task = functools.partial(_complete, autocomplete)
+        self.rectify_task = self.__locked_rectify if speller is not None else None
+
+        self.routes = {'/complete': self.__complete, '/rectify': self.__rectify, '/metrics': self.__metrics}
+        self.histograms = {path: LatencyHistogram() for path in self.routes}
+        self.coalesced = Counter()
+        self.inflight = {}
+        self.server = None
+
+    @classmethod
+    def with_process_pool(cls, vocab: Dict[str, int], model_path: Optional[str] = None, top_k=None,
+                          n_workers=None, mp_context=None, **kwargs) -> 'SpellingServer':
+        """
+        Server whose computations run in worker processes, every worker builds the completion model
+        and maps the speller saved by StatisticalSpeller.save into memory once at start.
+        Each process has its own caches, so no lock is needed
+        :param vocab: dictionary word -> score for AutoComplete
+        :param model_path: directory of the saved speller, /rectify is disabled without it
+        :param top_k: precomputed completions in AutoComplete
+        :param n_workers: number of processes, by default the number of CPUs
+        :param mp_context: multiprocessing context of the pool
+        :param kwargs: host, port and time_budget, see __init__
+        """
+        executor = ProcessPoolExecutor(max_workers=n_workers, mp_context=mp_context, initializer=_init_worker,
+                                       initargs=(vocab, top_k, model_path))
+        server = cls(None, None, executor, **kwargs)
+        server.complete_task = _worker_complete
+        server.rectify_task = _worker_rectify if model_path is not None else None
+        return server
+
+    async def start(self) -> asyncio.AbstractServer:
+        self.server = await asyncio.start_server(self.__handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.server
+
+    async def serve_forever(self) -> None:
+        if self.server is None:
+            await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def close(self) -> None:
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        # ждём воркеров, не блокируя цикл событий: процессы не должны пережить сервер
+        await asyncio.get_running_loop().run_in_executor(None, self.executor.shutdown)
+
+    async def __coalesce(self, key, function, *args):
+        """
+        Runs the function in the worker pool, a query identical to an in-flight one waits for its result
+        """
+        future = self.inflight.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+            self.inflight[key] = future
+            future.add_done_callback(lambda _: self.inflight.pop(key, None))
+        else:
+            self.coalesced[key[0]] += 1
+
+        # отмена одного клиента не должна отменять вычисление для остальных
+        return await asyncio.shield(future)
+
+    async def __complete(self, params):
+        prefix, k = _param(params, 'prefix'), _param(params, 'k', 5, int)
+        max_edits = max(_param(params, 'max_edits', 0, int), 0)
+        completes = await self.__coalesce(('/complete', prefix, k, max_edits), self.complete_task,
+                                          prefix, k, max_edits, self.time_budget)
+        return {'prefix': prefix, 'completions': completes}
+
+    async def __rectify(self, params):
+        if self.rectify_task is None:
+            raise BadRequest('speller is not loaded')
+        word, prev_word = _param(params, 'word'), _param(params, 'prev_word', '^')
+        correction = await self.__coalesce(('/rectify', word, prev_word), self.rectify_task, word, prev_word)
+        return {'word': word, 'correction': correction}
+
+    def __locked_rectify(self, word, prev_word):
+        with self.speller_lock:
+            return self.speller.rectify(word, prev_word)
+
+    async def __metrics(self, params):
+        return {
+            'latency': {path: histogram.as_dict() for path, histogram in self.histograms.items()},
+            'coalesced': dict(self.coalesced),
+            'inflight': len(self.inflight)
+        }
+
+    async def __handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        start = time.perf_counter()
+        path = None
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass
+
+            parts = request_line.decode('latin-1').split(' ', 2)
+            if len(parts) != 3:
+                raise BadRequest(f'malformed request line {request_line!r}')
+            target = parts[1]
+            url = urlsplit(target)
+            path = url.path
+            params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+
+            if path not in self.routes:
+                status, body = 404, {'error': f'unknown path {path}'}
+            else:
+                status, body = 200, await self.routes[path](params)
+        except BadRequest as e:
+            status, body = 400, {'error': str(e)}
+        except Exception as e:
+            # ошибки моделей и пула воркеров - ошибки сервера, а не запроса
+            status, body = 500, {'error': repr(e)}
+
+        payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        head = (f'HTTP/1.1 {status} {self.REASONS[status]}\r\n'
+                f'Content-Type: application/json; charset=utf-8\r\n'
+                f'Content-Length: {len(payload)}\r\n'
+                f'Connection: close\r\n\r\n')
+        try:
+            writer.write(head.encode('latin-1') + payload)
+            await writer.drain()
+        finally:
+            writer.close()
+
+        if path in self.histograms:
+            self.histograms[path].observe((time.perf_counter() - start) * 1000.0)
+
+
+async def fetch(host: str, port: int, target: str):
+    """
+    Minimal HTTP client for local checks
+    :return: status code and decoded JSON body
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f'GET {target} HTTP/1.1\r\nHost: {host}\r\n\r\n'.encode('latin-1'))
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+
+    head, body = response.split(b'\r\n\r\n', 1)
+    return int(head.split(b' ', 2)[1]), json.loads(body.decode('utf-8'))
+
+
+if __name__ == '__main__':
+    import os
+    from urllib.parse import quote
+
+    # Test the server on a free local port
+    class SlowSpeller:
+        def __init__(self):
+            self.calls = 0
+
+        def rectify(self, word, prev_word):
+            self.calls += 1
+            if word == 'boom':
+                raise RuntimeError('speller failure')
+            time.sleep(0.1)
+            return word.replace('kk', 'k')
+
+    async def check():
+        vocabulary = {'hackerearth': 10, 'hackerrank': 9, 'hacker': 6, 'hackerrating': 11, 'ёжик': 3}
+        speller = SlowSpeller()
+        server = SpellingServer(AutoComplete(vocab=vocabulary, top_k=5), speller, port=0)
+        await server.start()
+        port = server.port
+
+        status, body = await fetch('127.0.0.1', port, '/complete?prefix=hacker&k=2')
+        assert status == 200 and body['completions'] == [['hackerrating', 11], ['hackerearth', 10]]
+        status, body = await fetch('127.0.0.1', port, '/complete?prefix=hacker&k=1')
+        assert body['completions'] == [['hackerrating', 11]]
+        status, body = await fetch('127.0.0.1', port, '/complete?prefix=hakcer&k=2&max_edits=2')
+        assert body['completions'] == [['hackerrating', 11], ['hackerearth', 10]]
+        status, body = await fetch('127.0.0.1', port, '/complete?prefix=' + quote('ёж'))
+        assert body['completions'] == [['ёжик', 3]]
+
+        # одинаковые одновременные запросы считаются один раз
+        responses = await asyncio.gather(*(fetch('127.0.0.1', port, '/rectify?word=hakker') for _ in range(5)))
+        assert all(body['correction'] == 'haker' for _, body in responses)
+        assert speller.calls == 1
+
+        assert (await fetch('127.0.0.1', port, '/complete?k=2'))[0] == 400
+        assert (await fetch('127.0.0.1', port, '/unknown'))[0] == 404
+
+        status, body = await fetch('127.0.0.1', port, '/metrics')
+        assert body['coalesced'] == {'/rectify': 4}
+        assert body['latency']['/rectify']['count'] == 5 and body['latency']['/complete']['count'] == 5
+        assert body['latency']['/rectify']['p50_ms'] >= 100
+
+        # 400 только для неверных параметров, сбой модели - 500
+        assert (await fetch('127.0.0.1', port, '/complete?prefix=hacker&k=two'))[0] == 400
+        assert (await fetch('127.0.0.1', port, '/rectify?prev_word=a'))[0] == 400
+        assert (await fetch('127.0.0.1', port, '/rectify?word=boom'))[0] == 500
+
+        await server.close()
+
+    asyncio.run(check())
+
+    # Test the process pool: workers load the models themselves, only query arguments cross the process boundary
+    import tempfile
+    from multiprocessing import get_context
+    from SpellChecker import StatisticalSpeller
+
+    async def check_process_pool(model_path, expected):
+        vocabulary = {'hackerearth': 10, 'hackerrank': 9, 'hacker': 6, 'hackerrating': 11}
+        server = SpellingServer.with_process_pool(vocabulary, model_path, top_k=5, n_workers=2,
+                                                  mp_context=get_context('spawn'), port=0)
+        await server.start()
+        port = server.port
+
+        status, body = await fetch('127.0.0.1', port, '/complete?prefix=hacker&k=2')
+        assert status == 200 and body['completions'] == [['hackerrating', 11], ['hackerearth', 10]]
+        status, body = await fetch('127.0.0.1', port, '/complete?prefix=hakcer&k=2&max_edits=2')
+        assert body['completions'] == [['hackerrating', 11], ['hackerearth', 10]]
+
+        # слово без кандидатов возвращается без изменений, а не как 400
+        status, body = await fetch('127.0.0.1', port, '/rectify?word=zzz')
+        assert status == 200 and body['correction'] == 'zzz'
+
+        responses = await asyncio.gather(*(fetch('127.0.0.1', port, '/rectify?word=' + quote(word))
+                                           for word in expected))
+        assert [(status, body['correction']) for status, body in responses] == [(200, expected[word])
+                                                                                 for word in expected]
+
+        await server.close()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        speller = StatisticalSpeller(index_mode='csr')
+        speller.fit(['привет', 'приват', 'мир', 'миру', 'кошка', 'мышка'])
+        speller.fit_texts(['привет мир', 'кошка и мышка', 'миру мир'])
+        speller.save(tmp)
+
+        asyncio.run(check_process_pool(tmp, {word: speller.rectify(word, '^') for word in ('превет', 'кошко', 'мыр')}))
+
+    # обслуживание спеллера, сохранённого StatisticalSpeller.save (см. SpellerPipeline)
+    model_path = "../resources/speller_model"
+    if os.path.exists(model_path):
+        import pandas as pd
+        from SpellChecker import StatisticalSpeller
+
+        words = Counter(word for text in pd.read_csv("../resources/corrected_texts.csv")["text"]
+                        for word in text.lower().split())
+        server = SpellingServer(AutoComplete(vocab=dict(words), top_k=10), StatisticalSpeller.load(model_path))
+        asyncio.run(server.serve_forever())
@@ -0,0 +1,104 @@
+"""
+    Symmetric delete index (SymSpell) for dictionary lookups within a small edit distance
+"""
+import hashlib
+from typing import List, Tuple
+
+import numpy as np
+
+from BitParallelDistance import damerau_levenshtein_distance_many
+
+
+def fingerprint(string: str) -> int:
+    """
+    Stable 64-bit fingerprint of a string (unlike hash() it doesn't change between processes)
+    """
+    return int.from_bytes(hashlib.blake2b(string.encode('utf-8'), digest_size=8).digest(), 'little', signed=True)
+
+
+class SymSpellIndex:
+    """
+        Every dictionary word is stored under the fingerprints of all strings obtained from its prefix
+        by deleting up to `max_distance` letters. A query generates its own deletes, looks them up
+        and verifies the candidates with the Damerau-Levenshtein distance, so fingerprint collisions are harmless
+    """
+
+    def __init__(self, max_distance=2, prefix_length=7):
+        """
+        :param max_distance: maximum edit distance of candidates
+        :param prefix_length: only the first `prefix_length` letters of a word produce deletes
+        """
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.words = []
+        self.fingerprints = np.empty(0, dtype=np.int64)
+        self.word_ids = np.empty(0, dtype=np.int32)
+
+    def __deletes(self, word: str):
+        """
+        All strings obtained from the word prefix by deleting up to max_distance letters (the prefix included)
+        """
+        deletes = {word[:self.prefix_length]}
+        layer = deletes
+        for _ in range(self.max_distance):
+            layer = {string[:i] + string[i + 1:] for string in layer for i in range(len(string))} - deletes
+            deletes |= layer
+        return deletes
+
+    def build(self, words: List[str]) -> 'SymSpellIndex':
+        self.words = words
+
+        fingerprints, word_ids = [], []
+        for word_id, word in enumerate(words):
+            for delete in self.__deletes(word):
+                fingerprints.append(fingerprint(delete))
+                word_ids.append(word_id)
+
+        fingerprints = np.array(fingerprints, dtype=np.int64)
+        word_ids = np.array(word_ids, dtype=np.int32)
+
+        # сортируем по отпечатку, слова одного отпечатка идут по возрастанию номера
+        order = np.lexsort((word_ids, fingerprints))
+        self.fingerprints = fingerprints[order]
+        self.word_ids = word_ids[order]
+
+        return self
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def search(self, word: str, max_distance=None) -> List[Tuple[str, int]]:
+        """
+        Returns dictionary words within the given Damerau-Levenshtein distance
+        :param word: misspelled word
+        :param max_distance: maximum distance, not greater than the one the index is built for
+        :return: list of (candidate, distance) sorted by distance and candidate
+        """
+        max_distance = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+
+        keys = np.array([fingerprint(delete) for delete in self.__deletes(word)], dtype=np.int64)
+        starts = np.searchsorted(self.fingerprints, keys, side='left')
+        ends = np.searchsorted(self.fingerprints, keys, side='right')
+
+        candidate_ids = np.unique(np.concatenate([self.word_ids[start:end] for start, end in zip(starts, ends)]))
+        candidates = [self.words[word_id] for word_id in candidate_ids]
+        distances = damerau_levenshtein_distance_many(word, candidates, max_dist=max_distance)
+
+        return sorted(((candidate, dist) for candidate, dist in zip(candidates, distances) if dist <= max_distance),
+                      key=lambda x: x[::-1])
+
+
+if __name__ == '__main__':
+
+    # Test symmetric delete index with Damerau-Levenstein distance
+    dictionary = SymSpellIndex(max_distance=2).build(['hello', 'hallo', 'leetcode', 'hell', 'bell'])
+
+    assert dictionary.search('hello') == [('hello', 0), ('hallo', 1), ('hell', 1), ('bell', 2)]
+    assert dictionary.search('hello', 0) == [('hello', 0)]
+    assert dictionary.search('hhllo', 1) == [('hallo', 1), ('hello', 1)]
+    assert dictionary.search('ehllo', 1) == [('hello', 1)]
+    assert dictionary.search('ehllo', 2) == [('hello', 1), ('hallo', 2), ('hell', 2)]
+    assert not dictionary.search('hklo', 1)
+    assert dictionary.search('lettcode', 2) == [('leetcode', 1)]
+    assert dictionary.search('leetcdoe', 2) == [('leetcode', 1)]
+    assert dictionary.search('elloo', 2) == [('hello', 2)]
@@ -1,5 +1,7 @@
 from typing import List, Tuple
 
+import numpy as np
+
 
 class SpellingHammingDictionary:
     def __init__(self):
@@ -24,6 +26,9 @@ class SpellingHammingDictionary:
             self.add(word)
 
     def __search_dfs(self, node, word, dist, candidates, prefix, cost, start):
+        if cost > dist:
+            return
+
         if start == len(word) and 'is_leaf' in node and cost <= dist:
             candidates.append((''.join(prefix), cost))
             return
@@ -53,6 +58,119 @@ class SpellingHammingDictionary:
         return candidates
 
 
+class SpellingHammingIndex:
+    """
+        Words are split by length, every bucket is a matrix of letter codes (one row per word).
+        A query is compared with its bucket column by column, rows which have spent
+        the mismatch budget are dropped after each column
+    """
+
+    # maximum number of (query, word) pairs in one batch of search_many
+    BATCH_CELLS = 1 << 24
+
+    def __init__(self):
+        self.words = {}
+        self.codes = {}
+        # sorted bucket columns for search_many, built on the first query
+        self.columns = {}
+
+    def build_dict(self, words: List[str]) -> None:
+        """
+        Build a dictionary through a list of words
+        """
+        buckets = {}
+        for word in set(words):
+            buckets.setdefault(len(word), []).append(word)
+
+        self.words = {length: sorted(bucket) for length, bucket in buckets.items()}
+        self.codes = {length: self.__encode(bucket, length) for length, bucket in self.words.items()}
+        self.columns = {}
+
+    @staticmethod
+    def __encode(words: List[str], length: int) -> np.ndarray:
+        codes = np.fromiter((ord(letter) for word in words for letter in word), dtype=np.int32,
+                            count=len(words) * length)
+        return codes.reshape(len(words), length)
+
+    def search(self, word: str, distance=0) -> List[Tuple[str, int]]:
+        """
+        Returns candidates list with words that equal to the given word after modifying up to distance characters
+        :return: list of (candidate, distance) sorted by distance and candidate
+        """
+        if len(word) not in self.codes:
+            return []
+
+        codes, query = self.codes[len(word)], self.__encode([word], len(word))[0]
+        rows = np.arange(len(codes))
+        mismatches = np.zeros(len(codes), dtype=np.int32)
+        for column in range(len(word)):
+            mismatches += codes[rows, column] != query[column]
+            alive = mismatches <= distance
+            rows, mismatches = rows[alive], mismatches[alive]
+            if not len(rows):
+                return []
+
+        return self.__candidates(len(word), rows, mismatches)
+
+    def search_many(self, words: List[str], distance=0) -> List[List[Tuple[str, int]]]:
+        """
+        Batched search: for every column of a bucket the rows are sorted by letter, so rows with
+        the query letter form one range. Ranges of all queries of the same length are concatenated
+        and matches are counted by one bincount, mismatches are the length minus matches
+        :return: list of candidates for every word
+        """
+        results = [[] for _ in words]
+
+        queries = {}
+        for i, word in enumerate(words):
+            if len(word) in self.codes:
+                queries.setdefault(len(word), []).append(i)
+
+        for length, indices in queries.items():
+            if not length:
+                # the empty word matches only itself, there is nothing to compare
+                for i in indices:
+                    results[i] = self.__candidates(0, np.zeros(1, dtype=np.int64), np.zeros(1, dtype=np.int64))
+                continue
+
+            order, sorted_codes = self.__columns(length)
+            n_words = order.shape[1]
+            batch_size = max(1, self.BATCH_CELLS // n_words)
+            for start in range(0, len(indices), batch_size):
+                batch = indices[start:start + batch_size]
+                query_codes = self.__encode([words[i] for i in batch], length)
+
+                postings = []
+                for column in range(length):
+                    starts = np.searchsorted(sorted_codes[column], query_codes[:, column], side='left')
+                    ends = np.searchsorted(sorted_codes[column], query_codes[:, column], side='right')
+                    postings.extend(order[column, lo:hi] + j * n_words
+                                    for j, (lo, hi) in enumerate(zip(starts.tolist(), ends.tolist())))
+
+                matches = np.bincount(np.concatenate(postings), minlength=len(batch) * n_words)
+                mismatches = length - matches.reshape(len(batch), n_words)
+                for i, row_mismatches in zip(batch, mismatches):
+                    rows = np.flatnonzero(row_mismatches <= distance)
+                    results[i] = self.__candidates(length, rows, row_mismatches[rows])
+
+        return results
+
+    def __columns(self, length):
+        """
+        Rows of the bucket sorted by the letter of every column and the sorted letters themselves
+        """
+        if length not in self.columns:
+            codes = self.codes[length].T
+            order = np.argsort(codes, axis=1, kind='stable').astype(np.int64)
+            self.columns[length] = (order, np.take_along_axis(codes, order, axis=1))
+        return self.columns[length]
+
+    def __candidates(self, length, rows, mismatches) -> List[Tuple[str, int]]:
+        bucket = self.words[length]
+        return sorted(((bucket[row], mismatch) for row, mismatch in zip(rows.tolist(), mismatches.tolist())),
+                      key=lambda x: x[::-1])
+
+
 if __name__ == '__main__':
     dictionary = SpellingHammingDictionary()
     dictionary.build_dict(['hello', 'hallo', 'leetcode', 'hell'])
@@ -71,3 +189,24 @@ if __name__ == '__main__':
     assert dictionary.find_longest_prefix('hkloo') == 'h'
     assert dictionary.find_longest_prefix('lettcode') == 'le'
     assert dictionary.find_longest_prefix('hello') == 'hello'
+
+    # Test Hamming index with per-length buckets
+    index = SpellingHammingIndex()
+    index.build_dict(['hello', 'hallo', 'leetcode', 'hell'])
+
+    assert index.search('hello') == [('hello', 0)]
+    assert index.search('hhllo', 1) == [('hallo', 1), ('hello', 1)]
+    assert index.search('hkelo', 2) == [('hallo', 2), ('hello', 2)]
+    assert not index.search('hklo')
+    assert index.search('hklo', 2) == [('hell', 2)]
+    assert index.search('lettcode', 2) == [('leetcode', 1)]
+    assert not index.search('elloo', 2)
+    assert index.search('elloo', 3) == [('hallo', 3), ('hello', 3)]
+    assert not index.search('abc', 3)
+
+    queries = ['hhllo', 'hklo', 'lettcode', 'abc', 'elloo']
+    assert index.search_many(queries, 2) == [index.search(query, 2) for query in queries]
+
+    index.build_dict(['', 'a', 'ab'])
+    assert index.search('', 1) == [('', 0)]
+    assert index.search_many(['', 'b', ''], 1) == [[('', 0)], [('a', 1)], [('', 0)]]
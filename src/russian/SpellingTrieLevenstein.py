@@ -1,5 +1,10 @@
+import heapq
+from bisect import bisect_left
+from collections import deque
+
+import numpy as np
 from sortedcontainers import SortedDict, SortedListWithKey
-from typing import List, Optional
+from typing import Callable, List, Optional, Tuple
 
 
 class SpellingLevensteinTree:
@@ -17,10 +22,11 @@ class SpellingLevensteinTree:
     def __get_row_len(word: str) -> int:
         return len(word) + 1
 
-    def add(self, word: str) -> None:
+    def add(self, word: str, frequency=1) -> None:
         """
-        Add new word into trie
+        Add new word into trie, its frequency is kept in the leaf and summed up for repeated words
         :param word new string for the dictionary
+        :param frequency number of the word occurrences
         :return
         """
         node = self.root
@@ -28,16 +34,33 @@ class SpellingLevensteinTree:
             if letter not in node:
                 node[letter] = SortedDict()
             node = node[letter]
-        node[self.__END] = True
+        node[self.__END] = node.get(self.__END, 0) + frequency
 
-    def build_dict(self, words: List[str]) -> None:
+    def build_dict(self, words: List[str], frequencies: Optional[List[int]] = None) -> None:
         """
         Build a dictionary through a list of words
         :param words list of words for dictionary creating
+        :param frequencies word frequencies, 1 for every occurrence by default
         :return
         """
-        for word in words:
-            self.add(word)
+        for word, frequency in zip(words, frequencies or [1] * len(words)):
+            self.add(word, frequency)
+
+    def is_word(self, node: SortedDict) -> bool:
+        return self.__END in node
+
+    def children(self, node: SortedDict):
+        """
+        Pairs (letter, child node) of a trie node
+        """
+        return ((letter, child) for letter, child in node.items() if letter != self.__END)
+
+    def start_session(self, distance=0) -> 'FuzzySearchSession':
+        """
+        Start type-ahead fuzzy search, see FuzzySearchSession
+        :param distance Maximum distance for candidates
+        """
+        return FuzzySearchSession(self, distance)
 
     def find_longest_prefix(self, word: str) -> str:
         """
@@ -83,6 +106,56 @@ class SpellingLevensteinTree:
 
         return candidates
 
+    def search_top_k(self, word: str, k=10, max_distance=2,
+                     scorer: Optional[Callable[[str, int], float]] = None) -> List[Tuple[str, int]]:
+        """
+        Returns k best words within max_distance ranked by distance and then by score
+        The trie is explored best-first: a node goes to the heap with the minimum of its row,
+        a lower bound of the distance for all words under it, and a word goes to the same heap with its distance.
+        Nodes precede words with the same cost, so the popped words come out in the final order,
+        and the search stops after the k-th word
+        :param word Misspelled word
+        :param k number of candidates
+        :param max_distance Maximum distance for candidates
+        :param scorer function (word, frequency) -> score, the higher the better; word frequency by default
+        :return array of candidates with their distances
+        """
+        _calc_distance = self.__calculate_distance
+        use_damerau_modification = self.use_damerau_modification
+
+        heap, counter = [], 0
+
+        def push_children(prefix, node, prev_row, curr_row):
+            nonlocal counter
+            for letter, children in node.items():
+                if letter == self.__END:
+                    continue
+                child_prefix = prefix + [letter]
+                child_row, min_dist = _calc_distance(word, child_prefix,
+                                                     prev_row if use_damerau_modification else None, curr_row)
+                if min_dist <= max_distance:
+                    heapq.heappush(heap, (min_dist, 0, counter, child_prefix, children, curr_row, child_row))
+                    counter += 1
+
+        push_children([], self.root, None, [*range(self.__get_row_len(word))])
+
+        top = []
+        while heap and len(top) < k:
+            item = heapq.heappop(heap)
+            if item[1]:
+                top.append((item[3], item[0]))
+                continue
+
+            _, _, _, prefix, node, prev_row, curr_row = item
+            if curr_row[-1] <= max_distance and self.__END in node:
+                candidate, frequency = ''.join(prefix), node[self.__END]
+                score = scorer(candidate, frequency) if scorer else frequency
+                heapq.heappush(heap, (curr_row[-1], 1, -score, candidate))
+
+            push_children(prefix, node, prev_row, curr_row)
+
+        return top
+
     def __calculate_distance(self, word: str, prefix: List[str],
                              pre_prev_row: Optional[List[int]], prev_row: List[int]):
         """
@@ -113,6 +186,211 @@ class SpellingLevensteinTree:
         return curr_row, min_dist
 
 
+class FuzzySearchSession:
+    """
+        Fuzzy search for a query typed letter by letter.
+        The DP matrix is kept by columns: the j-th column maps trie prefixes to their distance
+        to the first j letters of the query. Only prefixes within the maximum distance are stored,
+        the others can't come back under it since every transition adds 0 or 1.
+        Typing a letter computes one new column from the previous ones, deleting a letter drops the last column.
+        Damerau-Levenstein mode uses the exact optimal string alignment recurrence
+    """
+
+    def __init__(self, tree: SpellingLevensteinTree, distance=0):
+        """
+        :param tree dictionary trie
+        :param distance Maximum distance for candidates
+        """
+        self.tree = tree
+        self.distance = distance
+        self.query = ''
+
+        # zero column: dictionary prefixes not longer than distance against the empty query
+        column, layer = {'': (tree.root, 0)}, [('', tree.root)]
+        for depth in range(1, distance + 1):
+            layer = [(prefix + letter, child) for prefix, node in layer for letter, child in tree.children(node)]
+            column.update((prefix, (node, depth)) for prefix, node in layer)
+        self.columns = [column]
+
+    def push(self, letter: str) -> SortedListWithKey:
+        """
+        Append a letter to the query
+        :return candidates for the new query
+        """
+        distance, children = self.distance, self.tree.children
+        column = {}
+
+        def relax(prefix, node, value):
+            if value <= distance and (prefix not in column or value < column[prefix][1]):
+                column[prefix] = (node, value)
+                return True
+            return False
+
+        # deletion of a query letter, a match or a substitution
+        for prefix, (node, value) in self.columns[-1].items():
+            relax(prefix, node, value + 1)
+            for child_letter, child in children(node):
+                relax(prefix + child_letter, child, value + (child_letter != letter))
+
+        # transposition of the last two query letters
+        if self.tree.use_damerau_modification and self.query and self.query[-1] != letter:
+            prev_letter = self.query[-1]
+            for prefix, (node, value) in self.columns[-2].items():
+                if value + 1 <= distance and letter in node and prev_letter in node[letter]:
+                    relax(prefix + letter + prev_letter, node[letter][prev_letter], value + 1)
+
+        # insertion of a dictionary letter: push the values down the trie
+        queue = deque(sorted(column, key=len))
+        while queue:
+            prefix = queue.popleft()
+            node, value = column[prefix]
+            if value + 1 <= distance:
+                queue.extend(prefix + child_letter for child_letter, child in children(node)
+                             if relax(prefix + child_letter, child, value + 1))
+
+        self.columns.append(column)
+        self.query += letter
+        return self.candidates()
+
+    def pop(self) -> SortedListWithKey:
+        """
+        Delete the last letter of the query
+        :return candidates for the new query
+        """
+        if self.query:
+            self.columns.pop()
+            self.query = self.query[:-1]
+        return self.candidates()
+
+    def candidates(self) -> SortedListWithKey:
+        """
+        Dictionary words within the maximum distance from the current query
+        :return array of candidates with their distances
+        """
+        return SortedListWithKey(((prefix, value) for prefix, (node, value) in self.columns[-1].items()
+                                  if prefix and self.tree.is_word(node)), key=lambda x: x[::-1])
+
+
+class CompactSpellingLevensteinTree:
+    """
+        The same trie as SpellingLevensteinTree flattened into arrays: nodes are numbered in BFS order
+        (the root is 0), children of the node v are the nodes [child_start[v], child_start[v + 1])
+        sorted by letter, labels keep the letter codes of the incoming edges.
+        Search is a DFS over node ids: DP rows are preallocated per depth and rewritten in place,
+        the current prefix is a buffer of letter codes, so a step allocates no rows and no prefix copies
+    """
+
+    def __init__(self, use_damerau_modification=False):
+        """
+        Initialize if trie data structure
+        :param use_damerau_modification Use Damerau-Levenstein distance, otherwise standard Lenevstein metric
+        """
+        self.use_damerau_modification = use_damerau_modification
+        self.child_start = np.zeros(2, dtype=np.int32)
+        self.labels = np.zeros(1, dtype=np.int32)
+        self.finals = np.zeros(1, dtype=np.bool_)
+        self.max_depth = 0
+
+    def build_dict(self, words: List[str]) -> None:
+        """
+        Build a dictionary through a list of words
+        :param words list of words for dictionary creating
+        :return
+        """
+        root = {}
+        for word in words:
+            node = root
+            for letter in word:
+                node = node.setdefault(letter, {})
+            node[None] = True
+
+        nodes, labels, finals, child_start = [root], [0], [], [1]
+        for node in nodes:
+            finals.append(None in node)
+            for letter in sorted(letter for letter in node if letter is not None):
+                nodes.append(node[letter])
+                labels.append(ord(letter))
+            child_start.append(len(nodes))
+
+        self.child_start = np.array(child_start, dtype=np.int32)
+        self.labels = np.array(labels, dtype=np.int32)
+        self.finals = np.array(finals, dtype=np.bool_)
+        self.max_depth = max(map(len, words), default=0)
+
+    def find_longest_prefix(self, word: str) -> str:
+        """
+        Find the longest word prefix in a trie dictionary
+        :param word any string
+        :return the maximum prefix in the dictionary
+        """
+        node = 0
+        for i, letter in enumerate(word):
+            lo, hi = int(self.child_start[node]), int(self.child_start[node + 1])
+            child = bisect_left(self.labels, ord(letter), lo, hi)
+            if child == hi or self.labels[child] != ord(letter):
+                return word[:i]
+            node = child
+        return word
+
+    def search(self, word: str, distance=0) -> SortedListWithKey:
+        """
+        Returns candidates list of words that equal to the given word after its modifying with Levenstein (DL) distance
+        :param word Misspelled word
+        :param distance Maximum distance for candidates where their cost could be less than given parameter
+        :return array of candidates with their distances
+        """
+        child_start, labels, finals = self.child_start, self.labels, self.finals
+        use_damerau_modification = self.use_damerau_modification
+
+        codes = [ord(letter) for letter in word]
+        # word[i - 2] as the original row computation sees it, i.e. with the wrap-around for i = 1
+        prev_codes = codes[-1:] + codes[:-1]
+        row_len = len(word) + 1
+
+        rows = [[0] * row_len for _ in range(self.max_depth + 1)]
+        rows[0][:] = range(row_len)
+        prefix = [0] * (self.max_depth + 1)
+
+        candidates = SortedListWithKey(key=lambda x: x[::-1])
+        stack = [(child, 1, letter) for child, letter in
+                 zip(range(child_start[0], child_start[1]), labels[child_start[0]:child_start[1]].tolist())]
+
+        while stack:
+            node, depth, letter = stack.pop()
+            prefix[depth] = letter
+            prev_row, curr_row = rows[depth - 1], rows[depth]
+            transposable = use_damerau_modification and depth > 1
+            pre_prev_row, prev_letter = (rows[depth - 2], prefix[depth - 1]) if transposable else (None, None)
+
+            # the row is computed in place, with insertion, deletion, substitution
+            # and transposition as in SpellingLevensteinTree
+            cost = min_dist = curr_row[0] = prev_row[0] + 1
+            for i in range(1, row_len):
+                code = codes[i - 1]
+                cost += 1
+                if prev_row[i] + 1 < cost:
+                    cost = prev_row[i] + 1
+                if prev_row[i - 1] + (code != letter) < cost:
+                    cost = prev_row[i - 1] + (code != letter)
+                if transposable and code == prev_letter and code != letter and prev_codes[i - 1] == letter and \
+                        pre_prev_row[i - 2] + 1 < cost:
+                    cost = pre_prev_row[i - 2] + 1
+                curr_row[i] = cost
+                if cost < min_dist:
+                    min_dist = cost
+
+            if min_dist > distance:
+                continue
+
+            if curr_row[-1] <= distance and finals[node]:
+                candidates.add((''.join(map(chr, prefix[1:depth + 1])), curr_row[-1]))
+
+            lo, hi = int(child_start[node]), int(child_start[node + 1])
+            stack.extend(zip(range(lo, hi), [depth + 1] * (hi - lo), labels[lo:hi].tolist()))
+
+        return candidates
+
+
 if __name__ == '__main__':
 
     # Test standard Levenstein Trie
@@ -143,3 +421,39 @@ if __name__ == '__main__':
     assert dictionary.search('ehllo', 2) == [('hello', 1), ('hallo', 2), ('hell', 2)]
     assert dictionary.search('leetcdoe', 2) == [('leetcode', 1)]
     assert dictionary.search('eletcode', 2) == [('leetcode', 1)]
+
+    # Test top-k search ranked by frequency
+    dictionary = SpellingLevensteinTree()
+    dictionary.build_dict(['hello', 'hallo', 'leetcode', 'hell', 'hello'])
+
+    assert dictionary.search_top_k('hhllo', 2) == [('hello', 1), ('hallo', 1)]
+    assert dictionary.search_top_k('hhllo', 3) == [('hello', 1), ('hallo', 1), ('hell', 2)]
+    assert dictionary.search_top_k('hhllo', 3, max_distance=1) == [('hello', 1), ('hallo', 1)]
+    assert dictionary.search_top_k('hhllo', 1, scorer=lambda word, frequency: -frequency) == [('hallo', 1)]
+    assert not dictionary.search_top_k('hklo', 3, max_distance=1)
+
+    # Test compact Levenstein and Damerau-Levenstein Tries
+    for use_damerau_modification in (False, True):
+        words = ['hello', 'hallo', 'leetcode', 'hell']
+        dictionary = SpellingLevensteinTree(use_damerau_modification)
+        dictionary.build_dict(words)
+        compact = CompactSpellingLevensteinTree(use_damerau_modification)
+        compact.build_dict(words)
+
+        for query in ['hello', 'hhllo', 'ehllo', 'hkelo', 'hklo', 'lettcode', 'elloo', 'leetcdoe', 'eletcode']:
+            for dist in range(4):
+                assert compact.search(query, dist) == dictionary.search(query, dist)
+            assert compact.find_longest_prefix(query) == dictionary.find_longest_prefix(query)
+
+    # Test type-ahead fuzzy search
+    dictionary = SpellingLevensteinTree(use_damerau_modification=True)
+    dictionary.build_dict(['hello', 'hallo', 'leetcode', 'hell'])
+    session = dictionary.start_session(distance=2)
+
+    for letter in 'ehll':
+        session.push(letter)
+    assert session.candidates() == [('hell', 1), ('hello', 2)]
+    assert session.push('o') == [('hello', 1), ('hallo', 2), ('hell', 2)]
+    assert session.pop() == [('hell', 1), ('hello', 2)]
+    assert session.push('p') == [('hell', 2), ('hello', 2)]
+    assert session.pop() == [('hell', 1), ('hello', 2)] and session.query == 'ehll'
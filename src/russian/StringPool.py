@@ -0,0 +1,89 @@
+"""
+    Compact immutable list of strings which can be saved to .npy files and memory-mapped back
+"""
+import os
+from bisect import bisect_left
+from typing import Iterable, Optional
+
+import numpy as np
+
+
+class StringPool:
+    """
+        All strings are kept in one utf-8 buffer, the i-th string lies in data[offsets[i]:offsets[i + 1]].
+        Strings are decoded lazily on access, so a loaded pool costs no Python objects per item
+    """
+
+    def __init__(self, data: np.ndarray, offsets: np.ndarray):
+        """
+        :param data: uint8 array with concatenated utf-8 strings
+        :param offsets: int64 array of len(strings) + 1 boundaries
+        """
+        self.data = data
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, strings: Iterable[str]) -> 'StringPool':
+        encoded = [string.encode('utf-8') for string in strings]
+
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum(np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)), out=offsets[1:])
+
+        return cls(np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self[i] for i in range(*item.indices(len(self)))]
+
+        if item < 0:
+            item += len(self)
+        if not 0 <= item < len(self):
+            raise IndexError('string pool index out of range')
+
+        return self.data[self.offsets[item]:self.offsets[item + 1]].tobytes().decode('utf-8')
+
+    def __iter__(self):
+        # один проход по буферу вместо среза массива на каждую строку
+        data, offsets = self.data.tobytes(), self.offsets.tolist()
+        for start, end in zip(offsets, offsets[1:]):
+            yield data[start:end].decode('utf-8')
+
+    def get(self, string: str, default=None) -> Optional[int]:
+        """
+        Returns an id of the string by binary search, the pool must be sorted
+        """
+        i = bisect_left(self, string)
+        return i if i < len(self) and self[i] == string else default
+
+    def save(self, path: str, name: str) -> None:
+        np.save(os.path.join(path, f'{name}_data.npy'), self.data)
+        np.save(os.path.join(path, f'{name}_offsets.npy'), self.offsets)
+
+    @classmethod
+    def load(cls, path: str, name: str, mmap=True) -> 'StringPool':
+        mmap_mode = 'r' if mmap else None
+        return cls(np.load(os.path.join(path, f'{name}_data.npy'), mmap_mode=mmap_mode),
+                   np.load(os.path.join(path, f'{name}_offsets.npy'), mmap_mode=mmap_mode))
+
+
+if __name__ == '__main__':
+    import tempfile
+
+    pool = StringPool.from_strings(['', 'ёж', 'кот', 'hello'])
+    assert len(pool) == 4
+    assert list(pool) == ['', 'ёж', 'кот', 'hello']
+    assert pool[-1] == 'hello'
+    assert pool[1:3] == ['ёж', 'кот']
+
+    sorted_pool = StringPool.from_strings(sorted(['ёж', 'кот', 'hello', 'дом']))
+    assert sorted_pool.get('кот') == 2
+    assert sorted_pool.get('кит') is None
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        sorted_pool.save(tmp_dir, 'words')
+        loaded = StringPool.load(tmp_dir, 'words')
+        assert list(loaded) == list(sorted_pool)
+        assert loaded.get('ёж') == 3
@@ -0,0 +1,210 @@
+"""
+    Minimized DAWG (directed acyclic word graph) for dictionary membership checks
+    Built from the sorted word list with the incremental algorithm of Daciuk et al. (2000)
+"""
+import os
+from typing import Iterable
+
+import numpy as np
+
+
+class WordDawg:
+    """
+        Words share both prefixes and suffixes, the graph is flattened into a double array:
+        letters of the dictionary are numbered (alphabet keeps their codes in sorted order),
+        the edge of the state s labeled with the c-th letter lies in the slot base[s] + c if check[slot] == s,
+        and target[slot] is the state it leads to. Edges of different states interleave in the same slots,
+        so the arrays stay about as small as a list of edges, a transition is a few array reads,
+        and the whole graph can be memory-mapped
+    """
+
+    ARRAYS = ('alphabet', 'base', 'check', 'target', 'finals')
+
+    # после стольких неудачных попыток свободный слот больше не проверяется для состояний с несколькими рёбрами
+    MAX_FAILS = 16
+
+    def __init__(self):
+        self.alphabet = np.empty(0, dtype=np.int32)
+        self.base = np.zeros(1, dtype=np.int32)
+        self.check = np.empty(0, dtype=np.int32)
+        self.target = np.empty(0, dtype=np.int32)
+        self.finals = np.zeros(1, dtype=np.bool_)
+        self.__make_views()
+
+    def __make_views(self):
+        # memoryview отдаёт элементы как int/bool без создания скаляров numpy и не копирует отображённые массивы
+        self.__columns = {chr(code): column for column, code in enumerate(self.alphabet.tolist())}
+        self.__base = memoryview(self.base)
+        self.__check = memoryview(self.check)
+        self.__target = memoryview(self.target)
+        self.__finals = memoryview(self.finals)
+
+    def collect(self, words: Iterable[str]) -> 'WordDawg':
+        """
+        Build the graph, words are lowercased like in WordDict
+        """
+        transitions, finals = [{}], [False]
+        register, unchecked = {}, []
+
+        def minimize(down_to):
+            while len(unchecked) > down_to:
+                parent, letter, child = unchecked.pop()
+                signature = (finals[child], tuple(sorted(transitions[child].items())))
+                if signature in register:
+                    transitions[parent][letter] = register[signature]
+                else:
+                    register[signature] = child
+
+        previous_word = ''
+        for word in sorted({word.lower() for word in words}):
+            common_prefix = 0
+            for previous_letter, letter in zip(previous_word, word):
+                if previous_letter != letter:
+                    break
+                common_prefix += 1
+
+            minimize(common_prefix)
+
+            state = unchecked[-1][2] if unchecked else 0
+            for letter in word[common_prefix:]:
+                transitions.append({})
+                finals.append(False)
+                transitions[state][letter] = len(transitions) - 1
+                unchecked.append((state, letter, len(transitions) - 1))
+                state = len(transitions) - 1
+
+            finals[state] = True
+            previous_word = word
+
+        minimize(0)
+        self.__flatten(transitions, finals)
+        return self
+
+    def __flatten(self, transitions, finals):
+        # нумеруем достижимые состояния в порядке обхода в ширину, корень получает номер 0
+        order, numbers = [0], {0: 0}
+        for state in order:
+            for target in transitions[state].values():
+                if target not in numbers:
+                    numbers[target] = len(order)
+                    order.append(target)
+
+        alphabet = sorted({letter for state in order for letter in transitions[state]})
+        columns = {letter: column for column, letter in enumerate(alphabet)}
+
+        # размещаем рёбра первым подходящим смещением: все слоты base + column должны быть свободны.
+        # Состояния с одним ребром занимают первый свободный слот, а состояния с несколькими рёбрами
+        # ищут место по отдельной карте, где помечены и занятые слоты, и дыры, не подошедшие много раз
+        base, check, target = [0] * len(order), [], []
+        used, blocked, fails = (bytearray(len(alphabet) + 1) for _ in range(3))
+        first_free = multi_free = 0
+        for i, state in enumerate(order):
+            edges = sorted((columns[letter], numbers[child]) for letter, child in transitions[state].items())
+            if not edges:
+                continue
+
+            single = len(edges) == 1
+            if not single:
+                multi_free = blocked.find(0, multi_free)
+            slot = first_free if single else multi_free
+            while True:
+                offset = slot - edges[0][0]
+                # за последним ребром всегда остаётся свободный слот, поэтому find не возвращает -1
+                if len(used) <= offset + len(alphabet):
+                    extension = bytes(offset + len(alphabet) + 1 - len(used))
+                    used.extend(extension)
+                    blocked.extend(extension)
+                    fails.extend(extension)
+                if offset >= 0 and not any(used[offset + column] for column, _ in edges[1:]):
+                    break
+                if single:
+                    slot = used.find(0, slot + 1)
+                else:
+                    fails[slot] += 1
+                    if fails[slot] == self.MAX_FAILS:
+                        blocked[slot] = 1
+                    slot = blocked.find(0, slot + 1)
+
+            base[i] = offset
+            if len(check) < offset + edges[-1][0] + 1:
+                extension = offset + edges[-1][0] + 1 - len(check)
+                check.extend([-1] * extension)
+                target.extend([-1] * extension)
+            for column, child in edges:
+                used[offset + column] = blocked[offset + column] = 1
+                check[offset + column] = i
+                target[offset + column] = child
+            first_free = used.find(0, first_free)
+
+        self.alphabet = np.array([ord(letter) for letter in alphabet], dtype=np.int32)
+        self.base = np.array(base, dtype=np.int32)
+        self.check = np.array(check, dtype=np.int32)
+        self.target = np.array(target, dtype=np.int32)
+        self.finals = np.array([finals[state] for state in order], dtype=np.bool_)
+        self.__make_views()
+
+    @property
+    def n_states(self) -> int:
+        return len(self.finals)
+
+    def __contains__(self, item: str) -> bool:
+        """
+        Membership check, the input must be already lowercased
+        """
+        columns, base, check, target = self.__columns, self.__base, self.__check, self.__target
+        n_slots = len(check)
+        state = 0
+        for letter in item:
+            column = columns.get(letter)
+            if column is None:
+                return False
+            slot = base[state] + column
+            if slot >= n_slots or check[slot] != state:
+                return False
+            state = target[slot]
+        return self.__finals[state]
+
+    def save(self, path: str, name='dawg') -> None:
+        os.makedirs(path, exist_ok=True)
+        for array_name in self.ARRAYS:
+            np.save(os.path.join(path, f'{name}_{array_name}.npy'), getattr(self, array_name))
+
+    @classmethod
+    def load(cls, path: str, name='dawg', mmap=True) -> 'WordDawg':
+        dawg = cls()
+        for array_name in cls.ARRAYS:
+            setattr(dawg, array_name, np.load(os.path.join(path, f'{name}_{array_name}.npy'),
+                                              mmap_mode='r' if mmap else None))
+        dawg.__make_views()
+        return dawg
+
+
+if __name__ == '__main__':
+    import tempfile
+
+    dictionary = WordDawg().collect(['tap', 'taps', 'top', 'tops', 'Hello', 'hell', 'ёж', 'ежи'])
+
+    assert 'tap' in dictionary and 'tops' in dictionary
+    assert 'hello' in dictionary and 'hell' in dictionary
+    assert 'ёж' in dictionary and 'ежи' in dictionary
+    assert 'ta' not in dictionary and 'topss' not in dictionary and 'ж' not in dictionary
+    assert '' not in dictionary
+    # суффиксы 'p' / 'ps' у 'ta' и 'to' общие
+    assert dictionary.n_states == 12
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        dictionary.save(tmp_dir)
+        loaded = WordDawg.load(tmp_dir)
+        assert 'taps' in loaded and 'hell' in loaded and 'hel' not in loaded
+
+    # Test the double array on a larger dictionary: edges of different states fill the same slots
+    import random
+
+    rng = random.Random(0)
+    stems = {''.join(rng.choice('абвгдежзиклмнопрстуфх') for _ in range(rng.randint(3, 7))) for _ in range(2000)}
+    words = {stem + ending for stem in stems for ending in rng.sample(['', 'а', 'у', 'ом', 'ами', 'ах', 'ы', 'ов'], 4)}
+    dictionary = WordDawg().collect(words)
+
+    assert all(word in dictionary for word in words)
+    assert not any(word + 'я' in dictionary or word[:-1] + 'я' in dictionary for word in words)
+    assert (dictionary.check >= 0).mean() > 0.8